@@ -3,7 +3,7 @@
 Example Build Script for RCC Self-Extracting Assistant
 
 This is a simple build automation script that wraps builder.py
-with sensible defaults and validation.
+with sensible defaults and validation. The builder runs in-process.
 
 Usage:
     python build.py
@@ -11,10 +11,84 @@ Usage:
 """
 
 import argparse
+import hashlib
+import os
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 
+import builder
+
+
+ROBOT_REPO_URL = "https://github.com/joshyorko/fetch-repos-bot.git"
+
+
+def get_cache_dir(url, ref):
+    """Get the persistent clone cache directory for a repository and ref."""
+    cache_root = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    cache_key = hashlib.sha256(f"{url}#{ref or ''}".encode()).hexdigest()
+    return cache_root / "rcc-builder" / cache_key
+
+
+def download_robot(url, ref, target):
+    """
+    Download a robot repository into target via a persistent clone cache.
+    
+    A cache hit is refreshed with a shallow fetch and hard reset; a miss is
+    shallow-cloned into the cache. The working tree (without .git) is then
+    copied to target.
+    
+    Returns:
+        True on success, False otherwise
+    """
+    cache_dir = get_cache_dir(url, ref)
+    
+    if (cache_dir / ".git").exists():
+        print(f"Updating cached clone: {cache_dir}")
+        fetched = subprocess.run(
+            ["git", "-C", str(cache_dir), "fetch", "--depth=1", "--no-tags",
+             "origin", ref or "HEAD"]
+        ).returncode == 0
+        if fetched:
+            fetched = subprocess.run(
+                ["git", "-C", str(cache_dir), "reset", "--hard", "FETCH_HEAD"]
+            ).returncode == 0
+        if not fetched:
+            print("WARNING: Failed to update cached clone, using cached copy")
+    else:
+        print(f"Cloning into cache: {cache_dir}")
+        cache_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Only the working tree is needed, so skip history and tags
+        cmd = ["git", "clone", "--depth=1", "--single-branch", "--no-tags"]
+        if ref:
+            cmd.extend(["--branch", ref])
+        cmd.extend([url, str(cache_dir)])
+        if subprocess.run(cmd).returncode != 0:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return False
+    
+    shutil.copytree(cache_dir, target, ignore=shutil.ignore_patterns(".git"))
+    return True
+
+
+def detect_rcc_home():
+    """
+    Find an RCC home in the usual locations.
+    
+    Returns:
+        Path to the first candidate that exists, or None
+    """
+    candidates = [
+        Path.home() / ".robocorp" / "holotree",
+        Path.home() / ".rcc_home",
+        Path(".rcc_home"),
+    ]
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    return None
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -51,7 +125,13 @@ def main():
     parser.add_argument(
         "--download-robot",
         action="store_true",
-        help="Download fetch-repos-bot if not present"
+        help="Download fetch-repos-bot if not present "
+             "(clones are cached in ~/.cache/rcc-builder)"
+    )
+    
+    parser.add_argument(
+        "--branch",
+        help="Branch or tag to download with --download-robot (default: remote HEAD)"
     )
     
     args = parser.parse_args()
@@ -61,50 +141,34 @@ def main():
     print("=" * 60)
     
     # Validate files exist
-    if not Path("builder.py").exists():
-        print("ERROR: builder.py not found in current directory")
-        return 1
-    
-    if not Path("launcher.py").exists():
-        print("ERROR: launcher.py not found in current directory")
+    launcher_path = Path(__file__).parent / "launcher.py"
+    if not launcher_path.exists():
+        print(f"ERROR: launcher.py not found: {launcher_path}")
         return 1
     
     # Download robot if requested
     if args.download_robot and not args.robot.exists():
         print(f"\nDownloading {args.robot}...")
-        result = subprocess.run([
-            "git", "clone",
-            "https://github.com/joshyorko/fetch-repos-bot.git",
-            str(args.robot)
-        ])
-        if result.returncode != 0:
+        if not download_robot(ROBOT_REPO_URL, args.branch, args.robot):
             print("ERROR: Failed to clone robot repository")
             return 1
     
     # Auto-detect RCC home if not specified
     if not args.rcc_home:
-        # Try common locations
-        candidates = [
-            Path.home() / ".robocorp" / "holotree",
-            Path.home() / ".rcc_home",
-            Path(".rcc_home"),
-        ]
-        for candidate in candidates:
-            if candidate.exists():
-                args.rcc_home = candidate
-                print(f"Auto-detected RCC home: {args.rcc_home}")
-                break
-    
-    # Build command
-    cmd = [
-        sys.executable, "builder.py",
+        args.rcc_home = detect_rcc_home()
+        if args.rcc_home:
+            print(f"Auto-detected RCC home: {args.rcc_home}")
+    
+    # Builder arguments
+    builder_args = [
         "--rcc", str(args.rcc),
         "--robot", str(args.robot),
-        "--output", str(args.output)
+        "--output", str(args.output),
+        "--launcher", str(launcher_path)
     ]
     
     if args.rcc_home:
-        cmd.extend(["--rcc-home", str(args.rcc_home)])
+        builder_args.extend(["--rcc-home", str(args.rcc_home)])
     
     # Print configuration
     print("\nBuild Configuration:")
@@ -114,11 +178,11 @@ def main():
     print(f"  Output:   {args.output}")
     print()
     
-    # Run builder
+    # Run builder in-process (no second interpreter start-up)
     print("Running builder...\n")
-    result = subprocess.run(cmd)
+    returncode = builder.main(builder_args)
     
-    if result.returncode == 0:
+    if returncode == 0:
         print("\n" + "=" * 60)
         print("✓ Build completed successfully!")
         print("=" * 60)
@@ -130,7 +194,7 @@ def main():
         print("\n" + "=" * 60)
         print("✗ Build failed")
         print("=" * 60)
-        return result.returncode
+        return returncode
 
 
 if __name__ == "__main__":
@@ -17,17 +17,101 @@ The result is a single .py file that can be distributed and run without dependen
 """
 
 import argparse
+import ast
 import logging
-import shutil
+import os
+import stat
 import sys
+import time
 import zipfile
+import zlib
 import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
 
+try:
+    # SIMD-accelerated drop-in for zlib, used by the compression workers and,
+    # with accelerated_zlib, the builder process; see write_payload
+    from zlib_ng import zlib_ng as _zlib
+except ImportError:
+    _zlib = zlib
+
 
 PAYLOAD_MARKER = b"===RCC_PAYLOAD_START==="
 
+# "python assistant.py" sees the ZIP end record and runs the file as a zip
+# application, so the payload carries a __main__.py that runs the launcher
+# code in front of the archive instead
+ZIPAPP_MAIN = "__main__.py"
+_ZIPAPP_MAIN_SOURCE = b'''\
+import sys
+
+marker = MARKER
+path = sys.argv[0]
+end = marker + b"PK\\x03\\x04"
+source = b""
+with open(path, "rb") as f:
+    while end not in source:
+        chunk = f.read(1 << 16)
+        if not chunk:
+            sys.exit(f"{path}: launcher code not found")
+        source += chunk
+source = source[:source.index(end) + len(marker)]
+exec(compile(source, path, "exec"), {"__name__": "__main__", "__file__": path})
+'''.replace(b"MARKER", repr(PAYLOAD_MARKER).encode())
+
+# zipimport reads ZIP64 archives only from Python 3.13, so an older Python
+# can run a ZIP64 assistant neither as a zip application nor as a script
+ZIP64_ZIPAPP_MIN_PYTHON = (3, 13)
+
+# Buffer size for file copies and hashing (fewer syscalls on large payloads)
+COPY_BUFFER_SIZE = 1 << 20
+
+# Already-compressed formats that are stored rather than deflated again
+_EXT_STORED = frozenset({
+    ".exe", ".dll", ".pyd", ".so", ".dylib",
+    ".gz", ".tgz", ".bz2", ".xz", ".zst", ".zip", ".whl", ".conda",
+    ".png", ".jpg", ".jpeg", ".pdf", ".webp",
+})
+
+# Text formats that still deflate well at slower levels
+_EXT_TEXT = frozenset({
+    ".py", ".json", ".yaml", ".yml", ".txt", ".cfg", ".toml", ".md",
+})
+
+# Earliest timestamp a ZIP entry can hold; used for reproducible payloads
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Directories never packaged from the robot project (hidden ones are skipped too)
+_PRUNED_DIRNAMES = frozenset({"__pycache__", "node_modules"})
+
+# Files larger than this are compressed in the main process rather than
+# being read whole into a worker
+PARALLEL_MAX_FILE_SIZE = 64 << 20
+
+# ZipInfo.compress_level is public from Python 3.13; before that the
+# per-entry level is the private ZipInfo._compresslevel
+_ZIPINFO_COMPRESS_LEVEL = hasattr(zipfile.ZipInfo, "compress_level")
+
+# Levels that give the same output as leaving the level unset
+_DEFAULT_LEVELS = frozenset({zlib.Z_DEFAULT_COMPRESSION, 6})
+
+# Compression results in flight per worker; bounds the parent's memory
+# when workers outpace the writer
+PARALLEL_WINDOW_PER_JOB = 4
+
+# ZipFile versions whose internals _write_deflated was checked against;
+# other versions compress every entry through ZipFile.open() instead
+RAW_ENTRY_WRITES = (3, 8) <= sys.version_info[:2] <= (3, 13)
+
+# Minimum seconds between progress lines while packing
+PROGRESS_INTERVAL = 1.0
+
 
 def setup_logging():
     """Configure logging to console."""
@@ -76,7 +160,329 @@ def validate_inputs(rcc_path, robot_path, logger):
     return valid
 
 
-def create_payload_zip(rcc_path, rcc_home_path, robot_path, output_zip, logger):
+def iter_files(root, prune=False, _prefix=""):
+    """
+    Recursively yield files below root using os.scandir.
+    
+    DirEntry caches the file type from the directory read, so no extra
+    stat() is needed per entry. Symlinked directories are not followed;
+    symlinked files are included, as with rglob(). When prune is set, hidden
+    files and directories and anything in _PRUNED_DIRNAMES are skipped
+    without being descended into.
+    
+    Args:
+        root: Directory to walk
+        prune: Skip hidden entries and _PRUNED_DIRNAMES directories
+        
+    Yields:
+        (path, relative_path, stat_result) tuples; relative_path uses "/"
+        separators
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if prune and entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if prune and entry.name in _PRUNED_DIRNAMES:
+                    continue
+                yield from iter_files(entry.path, prune, _prefix + entry.name + "/")
+            elif entry.is_file():
+                yield entry.path, _prefix + entry.name, entry.stat()
+
+
+def compress_type(path):
+    """Pick ZIP_STORED for already-compressed files, ZIP_DEFLATED otherwise."""
+    if os.path.splitext(path)[1].lower() in _EXT_STORED:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _copy_stream(src, dst, buf):
+    """
+    Copy an unbuffered source into dst through a caller-owned buffer.
+    
+    Reading with readinto() into one preallocated memoryview avoids a new
+    bytes object per chunk across the many entries of a payload.
+    """
+    while n := src.readinto(buf):
+        dst.write(buf[:n])
+
+
+def _zip_date_time():
+    """
+    Timestamp stored for every payload entry.
+    
+    Uses SOURCE_DATE_EPOCH when set, otherwise the earliest date ZIP can
+    represent, so identical inputs produce byte-identical payloads.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return max(time.gmtime(int(epoch))[:6], ZIP_EPOCH)
+    return ZIP_EPOCH
+
+
+def _zip_info(file_path, arcname, st, date_time):
+    """
+    Build the ZipInfo for a payload file with a fixed timestamp.
+    
+    Equivalent to ZipInfo.from_file() but reuses the stat result from the
+    directory walk instead of calling stat() again.
+    """
+    zinfo = zipfile.ZipInfo(arcname, date_time)
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.file_size = st.st_size
+    zinfo.compress_type = compress_type(file_path)
+    return zinfo
+
+
+def _deflate_one(path, level):
+    """
+    Read and raw-DEFLATE a single file (runs in a worker process).
+    
+    Returns:
+        (compressed_bytes, crc32, uncompressed_size) tuple
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    compressor = _zlib.compressobj(level, _zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), _zlib.crc32(data), len(data)
+
+
+def _set_compress_level(zinfo, level):
+    """
+    Give one entry its own DEFLATE level for ZipFile.open(zinfo, "w").
+    
+    Uses the public ZipInfo.compress_level from Python 3.13, and the private
+    _compresslevel it replaced only where RAW_ENTRY_WRITES vouches for the
+    ZipFile internals.
+    
+    Returns:
+        False if neither is available and the entry keeps zlib's default
+    """
+    if _ZIPINFO_COMPRESS_LEVEL:
+        zinfo.compress_level = level
+    elif RAW_ENTRY_WRITES:
+        zinfo._compresslevel = level
+    else:
+        return False
+    return True
+
+
+def _map_bounded(executor, fn, args, window):
+    """
+    Run fn(*a) for each tuple in args on executor, yielding results in order.
+    
+    Unlike executor.map(), which submits every task at once, at most window
+    tasks are submitted ahead of the result being consumed.
+    """
+    args = iter(args)
+    pending = deque(executor.submit(fn, *a) for a in islice(args, window))
+    
+    def results():
+        while pending:
+            future = pending.popleft()
+            for a in islice(args, 1):
+                pending.append(executor.submit(fn, *a))
+            yield future.result()
+    
+    return results()
+
+
+def _write_deflated(zf, zinfo, data, crc, size):
+    """
+    Append an entry whose DEFLATE stream was produced outside the ZipFile.
+    
+    zipfile has no public API for pre-compressed data, so this mirrors what
+    ZipFile._open_to_write() and _ZipWriteFile.close() do. CRC and sizes are
+    known up front, so the local header is final and no data descriptor or
+    seek-back is needed. Only used where RAW_ENTRY_WRITES is true.
+    """
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.flag_bits = 0
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    zinfo.compress_size = len(data)
+    zip64 = size > zipfile.ZIP64_LIMIT or len(data) > zipfile.ZIP64_LIMIT
+    
+    with zf._lock:
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.fp.write(zinfo.FileHeader(zip64))
+        zf.fp.write(data)
+        zf.start_dir = zf.fp.tell()
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def write_payload(zf, rcc_path, rcc_home_path, robot_path, logger, jobs=1,
+                  text_compresslevel=None, accelerated_zlib=False):
+    """
+    Add RCC, .rcc_home and the robot project to an open ZipFile.
+    
+    Entries are written sorted by archive name with a fixed timestamp (see
+    _zip_date_time) so that identical inputs give identical payloads.
+    
+    With jobs > 1, files that need DEFLATE are compressed in a process pool
+    (with zlib-ng when it is installed) and appended in order by the calling
+    process; at most PARALLEL_WINDOW_PER_JOB * jobs results are in flight, so
+    workers cannot run far ahead of the writer. With jobs == 1 and
+    accelerated_zlib, the same entries are deflated with zlib-ng in this
+    process instead, since zipfile itself always uses the stock zlib. Both
+    need RAW_ENTRY_WRITES; otherwise every entry goes through
+    ZipFile.open(). The RCC executable, stored files and files larger
+    than PARALLEL_MAX_FILE_SIZE are still streamed directly in
+    COPY_BUFFER_SIZE chunks.
+    
+    Deflated entries use zf.compresslevel, except _EXT_TEXT files when
+    text_compresslevel is given; this lets a fast default level be paired
+    with a better ratio on the sources and metadata that shrink most (see
+    _set_compress_level).
+    
+    Args:
+        zf: ZipFile opened for writing
+        rcc_path: Path to RCC executable
+        rcc_home_path: Path to .rcc_home directory (optional)
+        robot_path: Path to robot project directory
+        logger: Logger instance
+        jobs: Number of compression worker processes
+        text_compresslevel: DEFLATE level for _EXT_TEXT files (optional)
+        accelerated_zlib: Deflate with zlib-ng in this process when jobs == 1
+    """
+    # Add RCC executable
+    logger.info(f"Adding RCC: {rcc_path}")
+    rcc_arcname = rcc_path.name
+    entries = [(str(rcc_path), rcc_arcname, rcc_path.stat())]
+    
+    # Add .rcc_home if provided
+    if rcc_home_path and rcc_home_path.exists():
+        logger.info(f"Adding RCC home: {rcc_home_path}")
+        entries.extend(
+            (file_path, ".rcc_home/" + rel_path, st)
+            for file_path, rel_path, st in iter_files(rcc_home_path)
+        )
+    
+    # Add robot project (hidden, __pycache__ and node_modules are pruned)
+    logger.info(f"Adding robot project: {robot_path}")
+    entries.extend(
+        (file_path, "robot/" + rel_path, st)
+        for file_path, rel_path, st in iter_files(robot_path, prune=True)
+    )
+    
+    # Sorted order keeps the central directory stable between builds
+    entries.sort(key=itemgetter(1))
+    date_time = _zip_date_time()
+    total_files = len(entries)
+    total_mb = sum(st.st_size for _, _, st in entries) / 1024 / 1024
+    logger.info(f"Packing {total_files} files ({total_mb:.2f} MB)")
+    
+    if accelerated_zlib and _zlib is zlib:
+        logger.warning("zlib-ng is not installed; compressing with zlib")
+        accelerated_zlib = False
+    
+    # Decide up front which entries are deflated with _zlib rather than by
+    # zipfile: by the worker pool, or in this process when asked to
+    precompressed = set()
+    if (jobs > 1 or accelerated_zlib) and not RAW_ENTRY_WRITES:
+        logger.warning(f"Python {sys.version_info[0]}.{sys.version_info[1]} is not "
+                       f"supported for parallel or zlib-ng compression; using zipfile")
+        jobs = 1
+    elif jobs > 1 or accelerated_zlib:
+        # rcc itself is streamed rather than read whole into memory
+        precompressed = {
+            i for i, (file_path, arcname, st) in enumerate(entries)
+            if compress_type(file_path) == zipfile.ZIP_DEFLATED
+            and st.st_size <= PARALLEL_MAX_FILE_SIZE
+            and arcname != rcc_arcname
+        }
+        where = f"{jobs} workers" if jobs > 1 else "1 process"
+        logger.info(f"Compressing {len(precompressed)} files with {where} "
+                    f"({_zlib.__name__})")
+    
+    level = zf.compresslevel if zf.compresslevel is not None else zlib.Z_DEFAULT_COMPRESSION
+    levels = [level] * total_files
+    if text_compresslevel is not None:
+        for i, (file_path, _, _) in enumerate(entries):
+            if os.path.splitext(file_path)[1].lower() in _EXT_TEXT:
+                levels[i] = text_compresslevel
+    
+    # Entry point for running the assistant as a zip application
+    zinfo = zipfile.ZipInfo(ZIPAPP_MAIN, date_time)
+    zinfo.external_attr = (stat.S_IFREG | 0o644) << 16
+    zf.writestr(zinfo, _ZIPAPP_MAIN_SOURCE, zipfile.ZIP_DEFLATED)
+    
+    pool = jobs > 1 and precompressed
+    with ProcessPoolExecutor(max_workers=jobs) if pool else nullcontext() as executor:
+        args = ((entries[i][0], levels[i]) for i in sorted(precompressed))
+        if pool:
+            results = _map_bounded(executor, _deflate_one, args,
+                                   PARALLEL_WINDOW_PER_JOB * jobs)
+        else:
+            results = (_deflate_one(*a) for a in args)
+        
+        added = 0
+        added_bytes = 0
+        last_log = time.monotonic()
+        level_warned = False
+        buf = memoryview(bytearray(COPY_BUFFER_SIZE))
+        for i, (file_path, arcname, st) in enumerate(entries):
+            zinfo = _zip_info(file_path, arcname, st, date_time)
+            if arcname == rcc_arcname:
+                # Executable on extraction even if built from a copy without +x
+                zinfo.external_attr = (stat.S_IFREG | 0o755) << 16
+            if i in precompressed:
+                _write_deflated(zf, zinfo, *next(results))
+            else:
+                if (zinfo.compress_type == zipfile.ZIP_DEFLATED
+                        and levels[i] not in _DEFAULT_LEVELS
+                        and not _set_compress_level(zinfo, levels[i])
+                        and not level_warned):
+                    level_warned = True
+                    logger.warning(f"Python {sys.version_info[0]}.{sys.version_info[1]} "
+                                   f"cannot set per-entry DEFLATE levels; using zlib's default")
+                with open(file_path, "rb", buffering=0) as src, zf.open(zinfo, "w") as dst:
+                    _copy_stream(src, dst, buf)
+            added += 1
+            added_bytes += st.st_size
+            now = time.monotonic()
+            if now - last_log >= PROGRESS_INTERVAL:
+                last_log = now
+                logger.info(
+                    f"  Added {added}/{total_files} files "
+                    f"({added_bytes / 1024 / 1024:.2f}/{total_mb:.2f} MB)..."
+                )
+    
+    logger.info(f"Payload ZIP created with {added} files")
+
+
+def zip64_reason(infolist, central_dir_offset):
+    """
+    Explain why a payload needs ZIP64 extensions.
+    
+    Args:
+        infolist: ZipInfo objects of every entry in the payload
+        central_dir_offset: Position of the central directory in the output
+            file. zipfile compares its absolute start_dir, launcher included,
+            against ZIP64_LIMIT
+        
+    Returns:
+        A short description of the first limit exceeded, or None if the
+        payload fits a plain ZIP
+    """
+    if len(infolist) > zipfile.ZIP_FILECOUNT_LIMIT:
+        return f"{len(infolist):,} entries (limit {zipfile.ZIP_FILECOUNT_LIMIT:,})"
+    for zinfo in infolist:
+        if max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT:
+            return f"{zinfo.filename} is larger than {zipfile.ZIP64_LIMIT:,} bytes"
+    if central_dir_offset > zipfile.ZIP64_LIMIT:
+        return f"central directory starts past {zipfile.ZIP64_LIMIT:,} bytes"
+    return None
+
+
+def create_payload_zip(rcc_path, rcc_home_path, robot_path, output_zip, logger,
+                       compresslevel=None, jobs=1, accelerated_zlib=False):
     """
     Create a ZIP file containing all required components.
     
@@ -86,150 +492,289 @@ def create_payload_zip(rcc_path, rcc_home_path, robot_path, output_zip, logger):
         robot_path: Path to robot project directory
         output_zip: Path where ZIP file should be created
         logger: Logger instance
+        compresslevel: DEFLATE level 0-9 (default: zlib default)
+        jobs: Number of compression worker processes
+        accelerated_zlib: Deflate with zlib-ng in-process (see write_payload)
     """
     logger.info(f"Creating payload ZIP: {output_zip}")
     
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        # Add RCC executable
-        logger.info(f"Adding RCC: {rcc_path}")
-        zf.write(rcc_path, rcc_path.name)
-        
-        # Add .rcc_home if provided
-        if rcc_home_path and rcc_home_path.exists():
-            logger.info(f"Adding RCC home: {rcc_home_path}")
-            for file_path in rcc_home_path.rglob("*"):
-                if file_path.is_file():
-                    arcname = Path(".rcc_home") / file_path.relative_to(rcc_home_path)
-                    zf.write(file_path, arcname)
-                    if len(list(zf.namelist())) % 100 == 0:
-                        logger.info(f"  Added {len(zf.namelist())} files...")
-        
-        # Add robot project
-        logger.info(f"Adding robot project: {robot_path}")
-        for file_path in robot_path.rglob("*"):
-            if file_path.is_file():
-                # Skip common ignore patterns
-                if any(part.startswith(".") for part in file_path.parts):
-                    continue
-                if "__pycache__" in file_path.parts:
-                    continue
-                
-                arcname = Path("robot") / file_path.relative_to(robot_path)
-                zf.write(file_path, arcname)
-        
-        logger.info(f"Payload ZIP created with {len(zf.namelist())} files")
-        
-        # Calculate and log size
-        zip_size = output_zip.stat().st_size
-        logger.info(f"Payload size: {zip_size:,} bytes ({zip_size / 1024 / 1024:.2f} MB)")
+    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                         compresslevel=compresslevel) as zf:
+        write_payload(zf, rcc_path, rcc_home_path, robot_path, logger, jobs=jobs,
+                      accelerated_zlib=accelerated_zlib)
+    
+    # Calculate and log size
+    zip_size = output_zip.stat().st_size
+    logger.info(f"Payload size: {zip_size:,} bytes ({zip_size / 1024 / 1024:.2f} MB)")
 
 
 def calculate_file_hash(file_path):
     """Calculate SHA256 hash of a file."""
-    hasher = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
-            hasher.update(chunk)
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        hasher = hashlib.sha256()
+        buf = memoryview(bytearray(COPY_BUFFER_SIZE))
+        while n := f.readinto(buf):
+            hasher.update(buf[:n])
     return hasher.hexdigest()
 
 
-def create_self_extracting_file(launcher_path, payload_zip, output_path, logger):
+class _HashingWriter:
     """
-    Combine launcher.py and payload ZIP into a single self-extracting file.
+    Write-only file wrapper that feeds everything written into SHA256.
     
-    Args:
-        launcher_path: Path to launcher.py
-        payload_zip: Path to payload ZIP file
-        output_path: Path where assistant.py should be created
-        logger: Logger instance
+    It deliberately has no seek(), so ZipFile treats it as a stream and
+    never rewrites bytes that have already been hashed.
     """
-    logger.info(f"Creating self-extracting file: {output_path}")
     
-    with open(output_path, "wb") as out:
-        # Write launcher script
-        logger.info("Writing launcher script...")
-        with open(launcher_path, "rb") as launcher:
-            out.write(launcher.read())
+    def __init__(self, fp):
+        self._fp = fp
+        self.hasher = hashlib.sha256()
+    
+    def write(self, data):
+        self.hasher.update(data)
+        return self._fp.write(data)
+    
+    def tell(self):
+        return self._fp.tell()
+    
+    def flush(self):
+        self._fp.flush()
+
+
+def _find_header_end(source):
+    """
+    Find where the launcher code starts after its shebang and docstring.
+    
+    The source is parsed with ast, which also validates the launcher before
+    it is embedded and handles any docstring quoting style.
+    
+    Args:
+        source: Launcher source bytes
         
-        # Write marker comment (for human readability) - BEFORE the marker
-        out.write(b"\n# " + b"=" * 70 + b"\n")
-        out.write(b"# EMBEDDED PAYLOAD - DO NOT EDIT BELOW THIS LINE\n")
-        out.write(b"# " + b"=" * 70 + b"\n")
-        out.write(b"# ")
+    Returns:
+        Offset of the first byte after the module docstring (or after the
+        shebang line if there is no docstring), or 0 if there is neither
         
-        # Write payload marker - immediately followed by ZIP data
-        out.write(PAYLOAD_MARKER)
+    Raises:
+        SyntaxError: If the launcher is not valid Python
+    """
+    tree = ast.parse(source)
+    first = tree.body[0] if tree.body else None
+    if (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)):
+        header_lines = first.end_lineno
+    elif source.startswith(b"#!"):
+        header_lines = 1
+    else:
+        return 0
+    
+    pos = 0
+    for _ in range(header_lines):
+        pos = source.find(b"\n", pos)
+        if pos == -1:
+            return len(source)
+        pos += 1
+    return pos
+
+
+def add_metadata(launcher_source, metadata):
+    """
+    Replace the launcher's shebang and docstring with a build metadata header.
+    
+    Args:
+        launcher_source: Launcher source bytes
+        metadata: Dictionary of metadata to include
         
-        # Write payload ZIP immediately after marker (no newlines!)
-        logger.info("Writing payload ZIP...")
-        with open(payload_zip, "rb") as payload:
-            shutil.copyfileobj(payload, out)
+    Returns:
+        Launcher source bytes with the metadata header
+    """
+    header = [
+        b"#!/usr/bin/env python3\n",
+        b'"""\n',
+        b"Self-Extracting RCC Assistant\n",
+        b"\n",
+        b"Build Information:\n",
+    ]
+    
+    for key, value in metadata.items():
+        header.append(f"  {key}: {value}\n".encode())
+    
+    header.append(b'"""\n\n')
+    
+    return b"".join(header) + launcher_source[_find_header_end(launcher_source):]
+
+
+def _write_launcher_and_marker(out, launcher_source, logger):
+    """Write the launcher source, the payload banner and PAYLOAD_MARKER."""
+    logger.info("Writing launcher script...")
+    out.write(launcher_source)
+    
+    # Write marker comment (for human readability) - BEFORE the marker
+    out.write(b"\n# " + b"=" * 70 + b"\n")
+    out.write(b"# EMBEDDED PAYLOAD - DO NOT EDIT BELOW THIS LINE\n")
+    out.write(b"# " + b"=" * 70 + b"\n")
+    out.write(b"# ")
+    
+    # Write payload marker - immediately followed by ZIP data
+    out.write(PAYLOAD_MARKER)
+
+
+if hasattr(os, "copy_file_range"):
+    def _copy_file_range(out_fd, in_fd, offset, count):
+        return os.copy_file_range(in_fd, out_fd, count, offset)
+else:
+    _copy_file_range = None
+
+_sendfile = getattr(os, "sendfile", None)
+
+
+def _append_file(out, src_path):
+    """
+    Append the contents of src_path to the open file out.
     
-    # Calculate final size and hash
+    Uses os.copy_file_range() (Linux; can reflink or copy inside the file
+    system) or os.sendfile() so the kernel copies the data without it
+    passing through Python buffers; falls back to a buffered copy on
+    platforms without either or file systems that reject them.
+    """
+    out.flush()
+    with open(src_path, "rb", buffering=0) as src:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        for splice in (_copy_file_range, _sendfile):
+            if splice is None or offset >= size:
+                continue
+            try:
+                while offset < size:
+                    sent = splice(out.fileno(), src.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                pass
+        if offset < size:
+            src.seek(offset)
+            _copy_stream(src, out, memoryview(bytearray(COPY_BUFFER_SIZE)))
+
+
+def _log_output_summary(output_path, logger, final_hash=None):
+    """Log the size and SHA256 of a finished self-extracting file."""
     final_size = output_path.stat().st_size
-    final_hash = calculate_file_hash(output_path)
+    if final_hash is None:
+        final_hash = calculate_file_hash(output_path)
     
     logger.info(f"Self-extracting file created successfully")
     logger.info(f"Final size: {final_size:,} bytes ({final_size / 1024 / 1024:.2f} MB)")
     logger.info(f"SHA256: {final_hash}")
 
 
-def add_metadata(output_path, metadata, logger):
+def create_self_extracting_file(launcher_path, payload_zip, output_path, logger):
     """
-    Add metadata as a comment at the beginning of the file.
-    This must be called BEFORE create_self_extracting_file.
+    Combine launcher.py and payload ZIP into a single self-extracting file.
     
     Args:
-        output_path: Path to the launcher.py file to add metadata to
-        metadata: Dictionary of metadata to include
+        launcher_path: Path to launcher.py
+        payload_zip: Path to payload ZIP file
+        output_path: Path where assistant.py should be created
         logger: Logger instance
     """
-    logger.info("Adding metadata to launcher...")
+    logger.info(f"Creating self-extracting file: {output_path}")
     
-    # Read the launcher content
-    with open(output_path, "rb") as f:
-        content = f.read()
+    with open(output_path, "wb", buffering=COPY_BUFFER_SIZE) as out:
+        _write_launcher_and_marker(out, launcher_path.read_bytes(), logger)
+        
+        # Write payload ZIP immediately after marker (no newlines!)
+        logger.info("Writing payload ZIP...")
+        _append_file(out, payload_zip)
     
-    # Create metadata header
-    metadata_lines = [
-        b"#!/usr/bin/env python3\n",
-        b'"""\n',
-        b"Self-Extracting RCC Assistant\n",
-        b"\n",
-        b"Build Information:\n",
-    ]
+    _log_output_summary(output_path, logger)
+
+
+def build_assistant(launcher_path, rcc_path, rcc_home_path, robot_path, output_path,
+                    logger, metadata=None, compresslevel=None, jobs=1,
+                    text_compresslevel=None, accelerated_zlib=False,
+                    allow_zip64=False):
+    """
+    Build the self-extracting file in a single streaming pass.
     
-    for key, value in metadata.items():
-        metadata_lines.append(f"  {key}: {value}\n".encode())
+    The metadata header, launcher and marker are written first and the
+    payload ZIP is then written straight into the same file handle, so the
+    output is written exactly once. ZIP readers locate the central directory
+    from the end of the file, so the leading launcher bytes do not affect
+    extraction.
     
-    metadata_lines.append(b'"""\n\n')
+    A payload that needs ZIP64 (see zip64_reason) only runs on Python
+    ZIP64_ZIPAPP_MIN_PYTHON or later, so the build fails and the output is
+    removed unless allow_zip64 accepts that limit.
     
-    # Find where the actual launcher code starts (skip the original shebang and docstring)
-    lines = content.split(b"\n")
-    start_idx = 0
-    in_docstring = False
+    Args:
+        launcher_path: Path to launcher.py
+        rcc_path: Path to RCC executable
+        rcc_home_path: Path to .rcc_home directory (optional)
+        robot_path: Path to robot project directory
+        output_path: Path where assistant.py should be created
+        logger: Logger instance
+        metadata: Build information to put in the header (optional)
+        compresslevel: DEFLATE level 0-9 (default: zlib default)
+        jobs: Number of compression worker processes
+        text_compresslevel: DEFLATE level for text files (see write_payload)
+        accelerated_zlib: Deflate with zlib-ng in-process (see write_payload)
+        allow_zip64: Build a ZIP64 payload for Python ZIP64_ZIPAPP_MIN_PYTHON+
+        
+    Raises:
+        ValueError: If the payload needs ZIP64 and allow_zip64 is not set
+    """
+    logger.info(f"Creating self-extracting file: {output_path}")
     
-    for i, line in enumerate(lines):
-        if line.strip().startswith(b'"""'):
-            if not in_docstring:
-                in_docstring = True
-            else:
-                start_idx = i + 1
-                break
-        elif i == 0 and line.startswith(b"#!"):
-            continue
+    launcher_source = launcher_path.read_bytes()
+    if metadata:
+        logger.info("Adding metadata to launcher...")
+        launcher_source = add_metadata(launcher_source, metadata)
     
-    # Combine metadata and original content (skip original header)
-    remaining_content = b"\n".join(lines[start_idx:])
+    with open(output_path, "wb", buffering=COPY_BUFFER_SIZE) as f:
+        # Hash while writing so the output does not have to be read back
+        out = _HashingWriter(f)
+        _write_launcher_and_marker(out, launcher_source, logger)
+        payload_offset = out.tell()
+        
+        logger.info("Writing payload ZIP...")
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                             compresslevel=compresslevel) as zf:
+            write_payload(zf, rcc_path, rcc_home_path, robot_path, logger, jobs=jobs,
+                          text_compresslevel=text_compresslevel,
+                          accelerated_zlib=accelerated_zlib)
+            reason = zip64_reason(zf.infolist(), out.tell())
+        
+        min_python = ".".join(map(str, ZIP64_ZIPAPP_MIN_PYTHON))
+        if reason and allow_zip64:
+            logger.warning(f"Payload needs ZIP64: {reason}")
+            logger.warning(f"The assistant will only run on Python {min_python} or later; "
+                           f"older versions cannot import a ZIP64 {ZIPAPP_MAIN}")
+        
+        payload_size = out.tell() - payload_offset
+        logger.info(f"Payload size: {payload_size:,} bytes ({payload_size / 1024 / 1024:.2f} MB)")
     
-    # Write back
-    with open(output_path, "wb") as f:
-        f.writelines(metadata_lines)
-        f.write(remaining_content)
+    if reason and not allow_zip64:
+        output_path.unlink()
+        raise ValueError(f"Payload needs ZIP64 ({reason}), which Python before "
+                         f"{min_python} cannot import; allow ZIP64 to build an "
+                         f"assistant for Python {min_python} or later only")
+    
+    _log_output_summary(output_path, logger, out.hasher.hexdigest())
 
 
-def main():
-    """Main builder entry point."""
+def main(argv=None):
+    """
+    Main builder entry point.
+    
+    Args:
+        argv: Command-line arguments (default: sys.argv[1:])
+        
+    Returns:
+        Process exit code
+    """
     parser = argparse.ArgumentParser(
         description="Build a self-extracting RCC assistant",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -279,12 +824,37 @@ Example:
     )
     
     parser.add_argument(
-        "--temp-dir",
-        type=Path,
-        help="Temporary directory for build artifacts (default: system temp)"
+        "--compression-level",
+        type=int,
+        choices=range(10),
+        metavar="{0-9}",
+        help="DEFLATE level for compressible files (default: zlib default (6)); "
+             "already-compressed files are always stored"
+    )
+    
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for payload compression "
+             "(default: 1, 0 = one per CPU)"
+    )
+    
+    parser.add_argument(
+        "--zlib-ng",
+        action="store_true",
+        help="Deflate with zlib-ng in the builder process when it is installed "
+             "(the --jobs workers always use it)"
+    )
+    
+    parser.add_argument(
+        "--allow-zip64",
+        action="store_true",
+        help="Build payloads that need ZIP64 (over 65,535 files or 4 GiB); "
+             "the assistant then needs Python 3.13 or later"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Setup logging
     logger = setup_logging()
@@ -300,28 +870,8 @@ Example:
     if not validate_inputs(args.rcc, args.robot, logger):
         return 1
     
-    # Setup temp directory
-    if args.temp_dir:
-        temp_dir = args.temp_dir
-        temp_dir.mkdir(parents=True, exist_ok=True)
-    else:
-        import tempfile
-        temp_dir = Path(tempfile.mkdtemp(prefix="rcc_builder_"))
-    
-    logger.info(f"Using temp directory: {temp_dir}")
-    
     try:
-        # Create payload ZIP
-        payload_zip = temp_dir / "payload.zip"
-        create_payload_zip(
-            args.rcc,
-            args.rcc_home,
-            args.robot,
-            payload_zip,
-            logger
-        )
-        
-        # Prepare launcher with metadata
+        # Build information for the launcher header
         metadata = {
             "Build Date": datetime.now().isoformat(),
             "RCC Source": str(args.rcc.resolve()),
@@ -329,17 +879,19 @@ Example:
             "RCC Home": str(args.rcc_home.resolve()) if args.rcc_home else "None",
         }
         
-        # Copy launcher to temp and add metadata
-        launcher_with_metadata = temp_dir / "launcher_with_metadata.py"
-        shutil.copy(args.launcher, launcher_with_metadata)
-        add_metadata(launcher_with_metadata, metadata, logger)
-        
-        # Create self-extracting file using the launcher with metadata
-        create_self_extracting_file(
-            launcher_with_metadata,
-            payload_zip,
+        # Stream metadata, launcher, marker and payload ZIP into the output file
+        build_assistant(
+            args.launcher,
+            args.rcc,
+            args.rcc_home,
+            args.robot,
             args.output,
-            logger
+            logger,
+            metadata=metadata,
+            compresslevel=args.compression_level,
+            jobs=args.jobs or os.cpu_count() or 1,
+            accelerated_zlib=args.zlib_ng,
+            allow_zip64=args.allow_zip64
         )
         
         logger.info("=" * 60)
@@ -354,12 +906,6 @@ Example:
     except Exception as e:
         logger.error(f"Build failed: {e}", exc_info=True)
         return 1
-    
-    finally:
-        # Cleanup temp directory if we created it
-        if not args.temp_dir and temp_dir.exists():
-            logger.info(f"Cleaning up temp directory: {temp_dir}")
-            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
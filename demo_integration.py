@@ -6,19 +6,27 @@ This script demonstrates the full process:
 1. Download RCC
 2. Clone fetch-repos-bot
 3. Pre-build Holotree environment
-4. Create payload.zip with embedded environment
-5. Build self-extracting assistant.py
-6. Verify the binary contains the full launcher + payload
+4. Build self-extracting assistant.py with the embedded environment
+5. Verify the binary contains the full launcher + payload
 """
 
+import glob
+import http.client
 import os
 import sys
 import subprocess
 import tempfile
 import shutil
+import urllib.request
 import zipfile
 from pathlib import Path
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import builder
+from launcher import PAYLOAD_MARKER, find_payload_offset
 
 # Setup logging
 logging.basicConfig(
@@ -27,9 +35,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Leading bytes of ELF, PE and Mach-O (64-bit both endians, universal) files
+EXECUTABLE_MAGIC = (b"\x7fELF", b"MZ", b"\xcf\xfa\xed\xfe", b"\xfe\xed\xfa\xcf",
+                    b"\xca\xfe\xba\xbe")
+
 
-def download_rcc(target_dir):
-    """Download RCC executable."""
+def download_rcc(target_dir, verify=False):
+    """
+    Download RCC executable.
+    
+    The download is checked by its executable header and size; with verify,
+    'rcc version' is also run. Step 3 runs RCC anyway, so that is off by
+    default.
+    """
     logger.info("=" * 70)
     logger.info("STEP 1: Downloading RCC")
     logger.info("=" * 70)
@@ -52,20 +70,34 @@ def download_rcc(target_dir):
     logger.info(f"Downloading from: {rcc_url}")
     logger.info(f"Saving to: {rcc_path}")
     
-    result = subprocess.run(
-        ["curl", "-L", "-o", str(rcc_path), rcc_url],
-        capture_output=True,
-        text=True
-    )
-    
-    if result.returncode != 0:
-        logger.error(f"Failed to download RCC: {result.stderr}")
+    # Stream straight to disk; urlopen follows the CDN redirects itself
+    try:
+        with urllib.request.urlopen(rcc_url, timeout=60) as response, \
+                open(rcc_path, "wb") as f:
+            shutil.copyfileobj(response, f, length=1 << 20)
+    except (OSError, http.client.HTTPException) as e:
+        # IncompleteRead and friends are not OSErrors; drop the partial file
+        rcc_path.unlink(missing_ok=True)
+        logger.error(f"Failed to download RCC: {e}")
         return None
     
     # Make executable
     os.chmod(rcc_path, 0o755)
     
-    # Verify
+    # Cheap sanity check: a real executable, not an HTML error page
+    with open(rcc_path, "rb") as f:
+        header = f.read(4)
+    size = rcc_path.stat().st_size
+    if not header.startswith(EXECUTABLE_MAGIC) or size < 1024 * 1024:
+        logger.error(f"RCC download verification failed: not an RCC executable "
+                     f"(header {header.hex()}, {size:,} bytes)")
+        return None
+    
+    if not verify:
+        logger.info(f"✓ RCC downloaded successfully ({size / 1024 / 1024:.2f} MB)")
+        return rcc_path
+    
+    # Verify by running it
     result = subprocess.run(
         [str(rcc_path), "version"],
         capture_output=True,
@@ -94,8 +126,19 @@ def clone_fetch_repos_bot(target_dir):
     logger.info(f"Cloning from: {repo_url}")
     logger.info(f"Target: {target_dir}")
     
+    # Fail instead of waiting for credentials if the URL needs auth
+    env = os.environ.copy()
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    
+    # Protocol v2 lets the server filter refs (default only since git 2.26);
+    # gc.auto=0 keeps the clone from starting background maintenance
+    cmd = ["git", "-c", "protocol.version=2", "-c", "gc.auto=0",
+           "clone", "--depth", "1", "--single-branch", "--no-tags",
+           repo_url, str(target_dir)]
+    
     result = subprocess.run(
-        ["git", "clone", "--depth", "1", repo_url, str(target_dir)],
+        cmd,
+        env=env,
         capture_output=True,
         text=True
     )
@@ -116,6 +159,29 @@ def clone_fetch_repos_bot(target_dir):
     return True
 
 
+def _stat_tree(root):
+    """
+    Count files and directories below root and sum the file sizes.
+    
+    A single os.scandir walk; symlinked directories are not descended into.
+    
+    Returns:
+        (file_count, dir_count, total_size) tuple
+    """
+    file_count = dir_count = total_size = 0
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dir_count += 1
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    file_count += 1
+                    total_size += entry.stat().st_size
+    return file_count, dir_count, total_size
+
+
 def prebuild_holotree(rcc_path, robot_dir, rcc_home_dir):
     """Pre-build the Holotree environment using 'rcc holotree vars'."""
     logger.info("")
@@ -146,187 +212,151 @@ def prebuild_holotree(rcc_path, robot_dir, rcc_home_dir):
     logger.info("")
     
     # Run 'rcc holotree vars' from the robot directory
-    # This command finds conda.yaml automatically and builds the environment
-    result = subprocess.run(
+    # This command finds conda.yaml automatically and builds the environment.
+    # Output is streamed line by line rather than buffered whole; only the
+    # interesting lines and a short tail for error reporting are kept.
+    proc = subprocess.Popen(
         [str(rcc_path), "holotree", "vars"],
         env=env,
         cwd=robot_dir,  # Important: run from robot directory
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
         text=True,
-        timeout=900  # 15 minute timeout for complete build
+        bufsize=1
     )
-    
-    if result.returncode == 0:
-        logger.info("✓ Holotree environment built successfully!")
-        logger.info("")
-        
-        # Show some output from RCC
-        output_lines = result.stdout.split('\n')
-        for line in output_lines:
+    timer = threading.Timer(900, proc.kill)  # 15 minute timeout for complete build
+    tail = deque(maxlen=50)
+    timer.start()
+    try:
+        for line in proc.stdout:
+            line = line.rstrip()
+            tail.append(line)
             if 'SUCCESS' in line or 'Progress: 15/15' in line:
                 logger.info(f"  {line.strip()}")
             elif 'PYTHON_EXE' in line or 'CONDA_PREFIX' in line:
                 logger.info(f"  {line.strip()}")
+        returncode = proc.wait()
+        timed_out = not timer.is_alive()
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+    
+    if returncode == 0:
+        logger.info("✓ Holotree environment built successfully!")
     else:
-        logger.error(f"✗ Holotree build failed with exit code: {result.returncode}")
+        if timed_out:
+            logger.error("✗ Holotree build timed out after 15 minutes")
+        logger.error(f"✗ Holotree build failed with exit code: {returncode}")
         logger.error("")
-        if result.stdout:
+        if tail:
             logger.error("Output (last 50 lines):")
-            for line in result.stdout.split('\n')[-50:]:
-                logger.error(f"  {line}")
-        if result.stderr:
-            logger.error("Errors:")
-            for line in result.stderr.split('\n'):
+            for line in tail:
                 logger.error(f"  {line}")
         return False
     
     # Check if Holotree was created
-    if rcc_home_dir.exists() and any(rcc_home_dir.iterdir()):
-        files = list(rcc_home_dir.rglob("*"))
-        file_count = len([f for f in files if f.is_file()])
-        dir_count = len([f for f in files if f.is_dir()])
-        
-        logger.info("")
-        logger.info(f"✓ Holotree created at: {rcc_home_dir}")
-        logger.info(f"  Files: {file_count:,}")
-        logger.info(f"  Directories: {dir_count:,}")
-        
-        # Calculate size
-        total_size = sum(f.stat().st_size for f in files if f.is_file())
-        logger.info(f"  Total size: {total_size / 1024 / 1024:.2f} MB")
-        
-        # Look for key indicators of a complete environment
-        holotree_dir = rcc_home_dir / "holotree"
-        if holotree_dir.exists():
-            # Count environment spaces (directories with specific naming pattern)
-            env_spaces = [d for d in holotree_dir.iterdir() if d.is_dir() and len(d.name) > 10]
-            logger.info(f"  Environment spaces: {len(env_spaces)}")
-            
-            if env_spaces:
-                # Show info about the first environment space
-                first_space = env_spaces[0]
-                python_exe = first_space / "bin" / "python3"
-                if not python_exe.exists():
-                    python_exe = first_space / "bin" / "python"
-                
-                if python_exe.exists():
-                    logger.info(f"  ✓ Python executable found: {python_exe.relative_to(rcc_home_dir)}")
-                
-                # Check for site-packages
-                site_packages_dirs = list(first_space.rglob("site-packages"))
-                if site_packages_dirs:
-                    logger.info(f"  ✓ Found {len(site_packages_dirs)} site-packages directory(ies)")
-                    # Count packages in first site-packages
-                    sp = site_packages_dirs[0]
-                    if sp.exists():
-                        packages = [d for d in sp.iterdir() if d.is_dir() and not d.name.startswith('.')]
-                        logger.info(f"    Contains ~{len(packages)} Python packages")
-        
-        # Validation
-        logger.info("")
-        if file_count < 100:
-            logger.warning("  ⚠ WARNING: Holotree seems incomplete (very few files)")
-            logger.warning(f"  Expected: thousands of files for a complete Python environment")
-            logger.warning(f"  Actual: only {file_count} files")
-            logger.warning("  The assistant may not work in offline mode!")
-            return False
-        elif file_count < 10000:
-            logger.warning(f"  ⚠ Note: Holotree has {file_count:,} files (expected 30,000+)")
-            logger.warning("  Environment may be incomplete. Proceeding anyway...")
-            return True
-        else:
-            logger.info(f"  ✓ Holotree appears complete ({file_count:,} files)")
-        
-        return True
-    else:
+    if not rcc_home_dir.exists():
         logger.error("✗ Holotree directory is empty or not created")
         return False
-
-
-def create_payload_with_embedded_holotree(rcc_path, rcc_home_dir, robot_dir, output_zip):
-    """Create payload.zip with RCC, Holotree, and robot."""
-    logger.info("")
-    logger.info("=" * 70)
-    logger.info("STEP 4: Creating Payload ZIP")
-    logger.info("=" * 70)
     
-    rcc_path = Path(rcc_path)
-    rcc_home_dir = Path(rcc_home_dir)
-    robot_dir = Path(robot_dir)
-    output_zip = Path(output_zip)
-    
-    logger.info(f"Creating: {output_zip}")
+    file_count, dir_count, total_size = _stat_tree(rcc_home_dir)
+    if file_count == 0:
+        logger.error("✗ Holotree directory is empty or not created")
+        return False
     
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        # Add RCC executable
-        logger.info(f"Adding RCC: {rcc_path.name}")
-        zf.write(rcc_path, rcc_path.name)
-        
-        # Add .rcc_home (pre-built Holotree)
-        logger.info(f"Adding Holotree: {rcc_home_dir}")
-        file_count = 0
-        for file_path in rcc_home_dir.rglob("*"):
-            if file_path.is_file():
-                arcname = Path(".rcc_home") / file_path.relative_to(rcc_home_dir)
-                zf.write(file_path, arcname)
-                file_count += 1
-                if file_count % 100 == 0:
-                    logger.info(f"  Added {file_count} Holotree files...")
-        
-        logger.info(f"✓ Added {file_count} Holotree files")
-        
-        # Add robot project
-        logger.info(f"Adding robot: {robot_dir}")
-        robot_file_count = 0
-        for file_path in robot_dir.rglob("*"):
-            if file_path.is_file():
-                # Skip .git and other hidden files
-                if any(part.startswith(".") for part in file_path.parts):
-                    continue
-                if "__pycache__" in file_path.parts:
-                    continue
-                
-                arcname = Path("robot") / file_path.relative_to(robot_dir)
-                zf.write(file_path, arcname)
-                robot_file_count += 1
-        
-        logger.info(f"✓ Added {robot_file_count} robot files")
+    logger.info("")
+    logger.info(f"✓ Holotree created at: {rcc_home_dir}")
+    logger.info(f"  Files: {file_count:,}")
+    logger.info(f"  Directories: {dir_count:,}")
+    logger.info(f"  Total size: {total_size / 1024 / 1024:.2f} MB")
+    
+    # Look for key indicators of a complete environment
+    holotree_dir = rcc_home_dir / "holotree"
+    if holotree_dir.exists():
+        # Count environment spaces (directories with specific naming pattern)
+        env_spaces = [d for d in holotree_dir.iterdir() if d.is_dir() and len(d.name) > 10]
+        logger.info(f"  Environment spaces: {len(env_spaces)}")
         
-        total_files = len(zf.namelist())
-        logger.info(f"✓ Payload ZIP created: {total_files} total files")
-    
-    # Check size
-    zip_size = output_zip.stat().st_size
-    logger.info(f"✓ Payload size: {zip_size / 1024 / 1024:.2f} MB")
+        if env_spaces:
+            # Show info about the first environment space
+            first_space = env_spaces[0]
+            python_exe = first_space / "bin" / "python3"
+            if not python_exe.exists():
+                python_exe = first_space / "bin" / "python"
+            
+            if python_exe.exists():
+                logger.info(f"  ✓ Python executable found: {python_exe.relative_to(rcc_home_dir)}")
+            
+            # Check for site-packages
+            # Only the known layouts: lib/pythonX.Y (POSIX) and Lib (Windows)
+            site_packages_dirs = [
+                Path(p) for p in glob.glob(str(first_space / "lib" / "python*" / "site-packages"))
+            ]
+            if (first_space / "Lib" / "site-packages").is_dir():
+                site_packages_dirs.append(first_space / "Lib" / "site-packages")
+            if site_packages_dirs:
+                logger.info(f"  ✓ Found {len(site_packages_dirs)} site-packages directory(ies)")
+                # Count packages in first site-packages
+                sp = site_packages_dirs[0]
+                if sp.exists():
+                    packages = [d for d in sp.iterdir() if d.is_dir() and not d.name.startswith('.')]
+                    logger.info(f"    Contains ~{len(packages)} Python packages")
+    
+    # Validation
+    logger.info("")
+    if file_count < 100:
+        logger.warning("  ⚠ WARNING: Holotree seems incomplete (very few files)")
+        logger.warning(f"  Expected: thousands of files for a complete Python environment")
+        logger.warning(f"  Actual: only {file_count} files")
+        logger.warning("  The assistant may not work in offline mode!")
+        return False
+    elif file_count < 10000:
+        logger.warning(f"  ⚠ Note: Holotree has {file_count:,} files (expected 30,000+)")
+        logger.warning("  Environment may be incomplete. Proceeding anyway...")
+        return True
+    else:
+        logger.info(f"  ✓ Holotree appears complete ({file_count:,} files)")
     
     return True
 
 
-def build_self_extracting_assistant(payload_zip, output_file):
-    """Build the self-extracting assistant.py."""
+def build_self_extracting_assistant(rcc_path, rcc_home_dir, robot_dir, output_file,
+                                    compresslevel=1, text_compresslevel=6, jobs=None):
+    """
+    Build the self-extracting assistant.py with RCC, Holotree, and robot.
+    
+    The payload ZIP is streamed straight into the assistant after the
+    launcher, so no intermediate payload.zip is written.
+    
+    Most of the Holotree is wheels, shared libraries and other data that
+    barely deflates, so entries that are already compressed are stored and
+    the rest use a fast DEFLATE level by default. Sources and metadata get
+    text_compresslevel instead, since they still shrink well at a slower
+    level. Deflating runs in the builder's worker pool (one worker per CPU
+    unless jobs says otherwise).
+    """
     logger.info("")
     logger.info("=" * 70)
-    logger.info("STEP 5: Building Self-Extracting Assistant")
+    logger.info("STEP 4: Building Self-Extracting Assistant")
     logger.info("=" * 70)
     
-    # Import builder module
-    sys.path.insert(0, str(Path(__file__).parent))
-    import builder
-    
     launcher_path = Path(__file__).parent / "launcher.py"
-    payload_zip = Path(payload_zip)
     output_file = Path(output_file)
     
     logger.info(f"Launcher: {launcher_path}")
-    logger.info(f"Payload: {payload_zip}")
     logger.info(f"Output: {output_file}")
     
     # Build
-    builder.create_self_extracting_file(
+    builder.build_assistant(
         launcher_path,
-        payload_zip,
+        Path(rcc_path),
+        Path(rcc_home_dir),
+        Path(robot_dir),
         output_file,
-        logger
+        logger,
+        compresslevel=compresslevel,
+        jobs=jobs or os.cpu_count() or 1,
+        text_compresslevel=text_compresslevel
     )
     
     return True
@@ -336,7 +366,7 @@ def verify_assistant_binary(assistant_file):
     """Verify the assistant binary structure."""
     logger.info("")
     logger.info("=" * 70)
-    logger.info("STEP 6: Verifying Assistant Binary")
+    logger.info("STEP 5: Verifying Assistant Binary")
     logger.info("=" * 70)
     
     assistant_file = Path(assistant_file)
@@ -345,33 +375,31 @@ def verify_assistant_binary(assistant_file):
         logger.error(f"✗ Assistant file not found: {assistant_file}")
         return False
     
-    # Read the file
-    with open(assistant_file, "rb") as f:
-        content = f.read()
-    
-    file_size = len(content)
+    file_size = assistant_file.stat().st_size
     logger.info(f"Assistant file size: {file_size / 1024 / 1024:.2f} MB")
     
     # Check for shebang
-    if content.startswith(b"#!/usr/bin/env python3"):
+    shebang = b"#!/usr/bin/env python3"
+    with open(assistant_file, "rb") as f:
+        head = f.read(len(shebang))
+    if head == shebang:
         logger.info("✓ Shebang present")
     else:
         logger.warning("✗ Shebang missing or incorrect")
     
-    # Find payload marker
-    import launcher
-    marker = launcher.PAYLOAD_MARKER
-    
-    marker_pos = content.rfind(marker)
-    if marker_pos == -1:
+    # Locate the payload the same way the launcher does
+    zip_offset = find_payload_offset(assistant_file)
+    if zip_offset is None:
         logger.error("✗ Payload marker not found")
         return False
     
+    marker_pos = zip_offset - len(PAYLOAD_MARKER)
     logger.info(f"✓ Payload marker found at offset: {marker_pos}")
     
     # Check ZIP magic after marker
-    zip_offset = marker_pos + len(marker)
-    zip_magic = content[zip_offset:zip_offset+4]
+    with open(assistant_file, "rb") as f:
+        f.seek(zip_offset)
+        zip_magic = f.read(4)
     
     if zip_magic == b"PK\x03\x04":
         logger.info(f"✓ ZIP payload found at offset: {zip_offset}")
@@ -394,41 +422,36 @@ def verify_assistant_binary(assistant_file):
     logger.info("")
     logger.info("Testing ZIP extraction...")
     
-    with tempfile.TemporaryDirectory() as temp_extract:
-        temp_extract = Path(temp_extract)
-        temp_zip = temp_extract / "test_payload.zip"
-        
-        # Extract payload to temp ZIP
-        with open(assistant_file, "rb") as src:
-            src.seek(zip_offset)
-            with open(temp_zip, "wb") as dst:
-                dst.write(src.read())
-        
-        # Try to open as ZIP
-        try:
-            with zipfile.ZipFile(temp_zip, "r") as zf:
-                names = zf.namelist()
-                logger.info(f"✓ ZIP is valid with {len(names)} files")
-                
-                # Check for required files
-                has_rcc = any("rcc" in n for n in names)
-                has_holotree = any(".rcc_home" in n for n in names)
-                has_robot = any("robot/" in n for n in names)
-                
-                if has_rcc:
-                    logger.info("  ✓ Contains RCC executable")
-                if has_holotree:
-                    holotree_files = [n for n in names if ".rcc_home" in n]
-                    logger.info(f"  ✓ Contains Holotree ({len(holotree_files)} files)")
-                if has_robot:
-                    robot_files = [n for n in names if "robot/" in n]
-                    logger.info(f"  ✓ Contains robot ({len(robot_files)} files)")
-                
-                return has_rcc and has_holotree and has_robot
-                
-        except zipfile.BadZipFile as e:
-            logger.error(f"✗ ZIP validation failed: {e}")
-            return False
+    # ZipFile finds the central directory from the end of the file and
+    # allows for the launcher prepended to the archive, so no copy is needed
+    try:
+        with zipfile.ZipFile(assistant_file, "r") as zf:
+            names = zf.namelist()
+            logger.info(f"✓ ZIP is valid with {len(names)} files")
+            
+            # Check for required files in a single pass over the names
+            has_rcc = False
+            holotree_files = robot_files = 0
+            for n in names:
+                if n.startswith(".rcc_home/"):
+                    holotree_files += 1
+                elif n.startswith("robot/"):
+                    robot_files += 1
+                elif n == "rcc" or n == "rcc.exe":
+                    has_rcc = True
+            
+            if has_rcc:
+                logger.info("  ✓ Contains RCC executable")
+            if holotree_files:
+                logger.info(f"  ✓ Contains Holotree ({holotree_files} files)")
+            if robot_files:
+                logger.info(f"  ✓ Contains robot ({robot_files} files)")
+            
+            return has_rcc and holotree_files > 0 and robot_files > 0
+            
+    except zipfile.BadZipFile as e:
+        logger.error(f"✗ ZIP validation failed: {e}")
+        return False
 
 
 def main():
@@ -444,15 +467,20 @@ def main():
         logger.info(f"Working directory: {work_dir}")
         logger.info("")
         
-        # Step 1: Download RCC
-        rcc_path = download_rcc(work_dir / "rcc_bin")
+        # Steps 1 and 2: Download RCC and clone fetch-repos-bot
+        # Both are network-bound and independent, so they run concurrently
+        robot_dir = work_dir / "fetch-repos-bot"
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            rcc_future = pool.submit(download_rcc, work_dir / "rcc_bin")
+            clone_future = pool.submit(clone_fetch_repos_bot, robot_dir)
+            rcc_path = rcc_future.result()
+            cloned = clone_future.result()
+        
         if not rcc_path:
             logger.error("Failed to download RCC")
             return 1
         
-        # Step 2: Clone fetch-repos-bot
-        robot_dir = work_dir / "fetch-repos-bot"
-        if not clone_fetch_repos_bot(robot_dir):
+        if not cloned:
             logger.error("Failed to clone fetch-repos-bot")
             return 1
         
@@ -462,21 +490,15 @@ def main():
             logger.error("Failed to pre-build Holotree")
             return 1
         
-        # Step 4: Create payload ZIP
-        payload_zip = work_dir / "payload.zip"
-        if not create_payload_with_embedded_holotree(
-            rcc_path, rcc_home_dir, robot_dir, payload_zip
-        ):
-            logger.error("Failed to create payload")
-            return 1
-        
-        # Step 5: Build self-extracting assistant
+        # Step 4: Build self-extracting assistant (payload streamed in)
         assistant_file = work_dir / "assistant.py"
-        if not build_self_extracting_assistant(payload_zip, assistant_file):
+        if not build_self_extracting_assistant(
+            rcc_path, rcc_home_dir, robot_dir, assistant_file
+        ):
             logger.error("Failed to build assistant")
             return 1
         
-        # Step 6: Verify binary
+        # Step 5: Verify binary
         if not verify_assistant_binary(assistant_file):
             logger.error("Binary verification failed")
             return 1
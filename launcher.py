@@ -20,17 +20,44 @@ import os
 import sys
 import zipfile
 import logging
-import shutil
+import mmap
 import subprocess
 import hashlib
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
+try:
+    # Much faster than SHA-256 for change detection; optional
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
 # Payload marker - everything after this line is the ZIP payload
 PAYLOAD_MARKER = b"===RCC_PAYLOAD_START==="
 
+# A payload starts with a local file header, or an end record if it is empty
+ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+
+# Zip application entry point added by the builder; never extracted
+ZIPAPP_MAIN = "__main__.py"
+
+# RCC invocation: rcc run --robot <robot.yaml>, with ROBOCORP_HOME set to .rcc_home
+RCC_RUN_ARGS = ("run", "--robot")
+ROBOCORP_HOME_ENV = "ROBOCORP_HOME"
+
 # Configuration
 APP_NAME = "MyRccAssistant"
 EXTRACTION_ROOT = None  # Will be set based on OS
+EXTRACT_MIN_FILES_PER_WORKER = 256  # Smaller payloads are extracted serially
+HASH_CHUNK_SIZE = 1 << 20  # Read size when hashing without file_digest()
+STAMP_TAIL_SIZE = 64 << 10  # Trailing bytes hashed into the payload stamp
+MANIFEST_FILE = ".manifest.json"  # Located rcc/robot.yaml/.rcc_home paths
+
+# Payload hashes already computed in this process, keyed by script stamp
+_payload_hashes = {}
 
 
 def get_extraction_path():
@@ -67,14 +94,27 @@ def find_payload_offset(script_path):
     Find the byte offset where the ZIP payload starts.
     Returns the offset or None if marker not found.
     
-    Note: Searches for the LAST occurrence of the marker, since the marker
-    constant is defined in the launcher source code itself.
+    Note: The marker constant is defined in the launcher source code itself,
+    so the real marker is the first occurrence that is directly followed by
+    a ZIP signature. Scanning forwards stops right after the launcher code
+    instead of touching the payload, and a payload that happens to contain
+    the marker bytes cannot be mistaken for it. Files with no ZIP after the
+    marker fall back to its LAST occurrence.
     """
     with open(script_path, "rb") as f:
-        content = f.read()
-    
-    # Find the LAST occurrence of the marker (rfind)
-    marker_pos = content.rfind(PAYLOAD_MARKER)
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        # Search the mapped file rather than reading it into memory
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            marker_pos = content.find(PAYLOAD_MARKER)
+            while marker_pos != -1:
+                start = marker_pos + len(PAYLOAD_MARKER)
+                if content[start:start + 4] in ZIP_SIGNATURES:
+                    return start
+                marker_pos = content.find(PAYLOAD_MARKER, start)
+            
+            # Find the LAST occurrence of the marker (rfind)
+            marker_pos = content.rfind(PAYLOAD_MARKER)
     if marker_pos == -1:
         return None
     
@@ -82,51 +122,114 @@ def find_payload_offset(script_path):
     return marker_pos + len(PAYLOAD_MARKER)
 
 
+def payload_stamp(script_path, offset):
+    """
+    Cheap identity of the payload: script size, inode, mtime, payload offset
+    and a SHA256 of the last STAMP_TAIL_SIZE bytes (the ZIP's central
+    directory, which lists every entry's CRC).
+    """
+    with open(script_path, "rb", buffering=0) as f:
+        st = os.fstat(f.fileno())
+        f.seek(max(offset, st.st_size - STAMP_TAIL_SIZE))
+        tail = hashlib.sha256(f.read()).hexdigest()
+    return f"{st.st_size} {st.st_ino} {st.st_mtime_ns} {offset} {tail}"
+
+
 def calculate_payload_hash(script_path, offset):
-    """Calculate SHA256 hash of the embedded payload."""
-    hasher = hashlib.sha256()
-    with open(script_path, "rb") as f:
-        f.seek(offset)
-        while chunk := f.read(8192):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    """
+    Calculate a hash of the embedded payload.
+    
+    Uses BLAKE3 when the blake3 package is installed and SHA256 otherwise;
+    both give 64 hex digits, and a hash from the other algorithm simply
+    reads as a changed payload. The result is remembered for the script's
+    current stamp, so checking and then saving the hash in one run reads
+    the payload only once.
+    """
+    key = (str(script_path), payload_stamp(script_path, offset))
+    if key not in _payload_hashes:
+        with open(script_path, "rb", buffering=0) as f:
+            f.seek(offset)
+            if _blake3 is not None:
+                hasher = _blake3(max_threads=_blake3.AUTO)
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    hasher.update(chunk)
+            elif hasattr(hashlib, "file_digest"):  # Python 3.11+
+                hasher = hashlib.file_digest(f, "sha256")
+            else:
+                hasher = hashlib.sha256()
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    hasher.update(chunk)
+        _payload_hashes[key] = hasher.hexdigest()
+    return _payload_hashes[key]
+
+
+def restore_permissions(zip_ref, target_dir):
+    """
+    Re-apply the executable bits recorded in the ZIP after extraction.
+    
+    ZipFile.extractall() ignores the Unix mode stored in external_attr, so
+    without this rcc and the Holotree's binaries are extracted without +x.
+    """
+    if sys.platform == "win32":
+        return
+    for info in zip_ref.infolist():
+        mode = (info.external_attr >> 16) & 0o777
+        if mode & 0o111 and not info.is_dir():
+            os.chmod(target_dir / info.filename, mode)
 
 
-def extract_payload(script_path, offset, target_dir, logger):
+def _extract_members(script_path, members, target_dir):
+    """Extract some payload members using a private ZipFile handle."""
+    with zipfile.ZipFile(script_path, "r") as zip_ref:
+        for info in members:
+            zip_ref.extract(info, target_dir)
+
+
+def extract_payload(script_path, offset, target_dir, logger, workers=None):
     """
     Extract the embedded ZIP payload to target directory.
     
     Args:
         script_path: Path to this script file
-        offset: Byte offset where ZIP payload starts
+        offset: Byte offset where ZIP payload starts (the archive itself is
+            located from its central directory)
         target_dir: Directory to extract payload into
         logger: Logger instance
+        workers: Number of extraction threads (default: one per CPU, with at
+            least EXTRACT_MIN_FILES_PER_WORKER members each)
     """
     logger.info(f"Extracting payload to: {target_dir}")
     
     # Create target directory
     target_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Extract ZIP payload
-    temp_zip = target_dir / ".temp_payload.zip"
-    try:
-        # Copy payload to temporary ZIP file
-        with open(script_path, "rb") as src:
-            src.seek(offset)
-            with open(temp_zip, "wb") as dst:
-                shutil.copyfileobj(src, dst)
-        
-        # Extract ZIP contents
-        logger.info("Extracting ZIP contents...")
-        with zipfile.ZipFile(temp_zip, "r") as zip_ref:
-            zip_ref.extractall(target_dir)
-        
-        logger.info(f"Extraction complete: {len(list(target_dir.rglob('*')))} items extracted")
-        
-    finally:
-        # Clean up temporary ZIP file
-        if temp_zip.exists():
-            temp_zip.unlink()
+    # Paths located in a previous extraction may no longer be valid
+    (target_dir / MANIFEST_FILE).unlink(missing_ok=True)
+    
+    # Extract straight from this script: ZipFile finds the archive from its
+    # end records and allows for the launcher code in front of it
+    logger.info("Extracting ZIP contents...")
+    with zipfile.ZipFile(script_path, "r") as zip_ref:
+        members = [info for info in zip_ref.infolist() if info.filename != ZIPAPP_MAIN]
+        if workers is None:
+            workers = min(os.cpu_count() or 1, len(members) // EXTRACT_MIN_FILES_PER_WORKER)
+        if workers > 1:
+            # Create directories up front so workers don't race on makedirs
+            for parent in {os.path.dirname(info.filename) for info in members}:
+                (target_dir / parent).mkdir(parents=True, exist_ok=True)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # list() re-raises the first worker error, if any
+                list(pool.map(
+                    _extract_members,
+                    repeat(script_path),
+                    [members[i::workers] for i in range(workers)],
+                    repeat(target_dir),
+                ))
+        else:
+            zip_ref.extractall(target_dir, members)
+        restore_permissions(zip_ref, target_dir)
+        count = len(members)
+    
+    logger.info(f"Extraction complete: {count} items extracted")
 
 
 def should_extract(target_dir, script_path, offset, logger):
@@ -137,6 +240,10 @@ def should_extract(target_dir, script_path, offset, logger):
     - Target directory doesn't exist
     - Target directory is empty
     - Payload hash has changed (indicates updated bundle)
+    
+    The hash is only computed when payload_stamp differs from the one saved
+    at extraction time: the script's size, inode or mtime_ns, the payload
+    offset, or the SHA256 of its last STAMP_TAIL_SIZE bytes (64 KiB).
     """
     if not target_dir.exists():
         logger.info("Target directory does not exist, extraction needed")
@@ -153,6 +260,11 @@ def should_extract(target_dir, script_path, offset, logger):
         logger.info("Payload hash file missing, extraction needed")
         return True
     
+    stamp_file = target_dir / ".payload_stamp"
+    if stamp_file.exists() and stamp_file.read_text() == payload_stamp(script_path, offset):
+        logger.info("Script unchanged since extraction, skipping extraction")
+        return False
+    
     current_hash = calculate_payload_hash(script_path, offset)
     stored_hash = hash_file.read_text().strip()
     
@@ -162,15 +274,40 @@ def should_extract(target_dir, script_path, offset, logger):
         logger.info(f"  Current: {current_hash}")
         return True
     
+    # Same payload with a new mtime (e.g. copied): refresh the stamp
+    stamp_file.write_text(payload_stamp(script_path, offset))
     logger.info("Payload unchanged, skipping extraction")
     return False
 
 
 def save_payload_hash(target_dir, script_path, offset):
-    """Save the current payload hash for future comparison."""
+    """Save the current payload hash and script stamp for future comparison."""
     current_hash = calculate_payload_hash(script_path, offset)
     hash_file = target_dir / ".payload_hash"
     hash_file.write_text(current_hash)
+    (target_dir / ".payload_stamp").write_text(payload_stamp(script_path, offset))
+
+
+def _find_file_bfs(target_dir, names):
+    """
+    Breadth-first search for the shallowest file whose name is in names.
+
+    Shallow matches return before the walk descends into the deep
+    Holotree trees, which rglob would visit in full.
+    """
+    pending = deque([target_dir])
+    while pending:
+        directory = pending.popleft()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name in names and entry.is_file():
+                        return Path(entry.path)
+        except OSError:
+            continue
+    return None
 
 
 def find_rcc_executable(target_dir):
@@ -187,12 +324,8 @@ def find_rcc_executable(target_dir):
         if candidate.exists() and candidate.is_file():
             return candidate
     
-    # Search recursively
-    for rcc_path in target_dir.rglob("rcc*"):
-        if rcc_path.is_file() and (rcc_path.name == "rcc.exe" or rcc_path.name == "rcc"):
-            return rcc_path
-    
-    return None
+    # Search recursively, shallowest match first
+    return _find_file_bfs(target_dir, {"rcc.exe", "rcc"})
 
 
 def find_robot_yaml(target_dir):
@@ -208,11 +341,8 @@ def find_robot_yaml(target_dir):
         if candidate.exists() and candidate.is_file():
             return candidate
     
-    # Search recursively
-    for robot_path in target_dir.rglob("robot.yaml"):
-        return robot_path
-    
-    return None
+    # Search recursively, shallowest match first
+    return _find_file_bfs(target_dir, {"robot.yaml"})
 
 
 def find_rcc_home(target_dir):
@@ -229,6 +359,43 @@ def find_rcc_home(target_dir):
     return None
 
 
+def locate_payload_paths(target_dir):
+    """
+    Locate the rcc executable, robot.yaml and .rcc_home directory.
+
+    The located paths are cached in the manifest file so later launches
+    skip the directory searches; the cache is dropped on re-extraction.
+
+    Returns:
+        Tuple (rcc_exe, robot_yaml, rcc_home); each entry may be None
+    """
+    manifest_file = target_dir / MANIFEST_FILE
+    try:
+        manifest = json.loads(manifest_file.read_text())
+        rcc_exe = target_dir / manifest["rcc"]
+        robot_yaml = target_dir / manifest["robot_yaml"]
+        rcc_home = target_dir / manifest["rcc_home"] if manifest["rcc_home"] else None
+        if rcc_exe.is_file() and robot_yaml.is_file() and (rcc_home is None or rcc_home.is_dir()):
+            return rcc_exe, robot_yaml, rcc_home
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    rcc_exe = find_rcc_executable(target_dir)
+    robot_yaml = find_robot_yaml(target_dir)
+    rcc_home = find_rcc_home(target_dir)
+    if rcc_exe and robot_yaml:
+        manifest = {
+            "rcc": rcc_exe.relative_to(target_dir).as_posix(),
+            "robot_yaml": robot_yaml.relative_to(target_dir).as_posix(),
+            "rcc_home": rcc_home.relative_to(target_dir).as_posix() if rcc_home else None,
+        }
+        try:
+            manifest_file.write_text(json.dumps(manifest))
+        except OSError:
+            pass  # Only a cache; the next launch searches again
+    return rcc_exe, robot_yaml, rcc_home
+
+
 def run_rcc(rcc_exe, robot_yaml, rcc_home, logger):
     """
     Execute RCC with the embedded robot.
@@ -243,14 +410,15 @@ def run_rcc(rcc_exe, robot_yaml, rcc_home, logger):
     logger.info(f"Robot: {robot_yaml}")
     
     # Build command
-    cmd = [str(rcc_exe), "run", "--robot", str(robot_yaml)]
+    cmd = [str(rcc_exe), *RCC_RUN_ARGS, str(robot_yaml)]
     
-    # Set up environment
-    env = os.environ.copy()
+    # Set up environment (None inherits ours without copying it)
+    env = None
     
     if rcc_home:
-        logger.info(f"Using ROBOCORP_HOME: {rcc_home}")
-        env["ROBOCORP_HOME"] = str(rcc_home)
+        env = os.environ.copy()
+        logger.info(f"Using {ROBOCORP_HOME_ENV}: {rcc_home}")
+        env[ROBOCORP_HOME_ENV] = str(rcc_home)
     
     # Run RCC
     logger.info(f"Executing command: {' '.join(cmd)}")
@@ -260,7 +428,10 @@ def run_rcc(rcc_exe, robot_yaml, rcc_home, logger):
             env=env,
             cwd=robot_yaml.parent,
             capture_output=False,  # Stream output directly
-            text=True
+            text=True,
+            # Python opens files non-inheritable (PEP 446), so only stdio
+            # reaches rcc; skips closing every other descriptor on spawn
+            close_fds=False
         )
         
         if result.returncode != 0:
@@ -311,24 +482,19 @@ def main():
             logger.error(f"Extraction failed: {e}", exc_info=True)
             return 1
     
-    # Find RCC executable
-    logger.info("Locating RCC executable...")
-    rcc_exe = find_rcc_executable(extraction_dir)
+    # Find RCC executable, robot.yaml and .rcc_home (optional)
+    logger.info("Locating RCC executable and robot.yaml...")
+    rcc_exe, robot_yaml, rcc_home = locate_payload_paths(extraction_dir)
     if not rcc_exe:
         logger.error("Could not find rcc.exe in extracted payload")
         return 1
     logger.info(f"Found RCC: {rcc_exe}")
     
-    # Find robot.yaml
-    logger.info("Locating robot.yaml...")
-    robot_yaml = find_robot_yaml(extraction_dir)
     if not robot_yaml:
         logger.error("Could not find robot.yaml in extracted payload")
         return 1
     logger.info(f"Found robot: {robot_yaml}")
     
-    # Find .rcc_home (optional)
-    rcc_home = find_rcc_home(extraction_dir)
     if rcc_home:
         logger.info(f"Found RCC home: {rcc_home}")
     else:
@@ -10,13 +10,53 @@ This test validates all audit requirements:
 5. Windows runtime behavior
 """
 
+import argparse
+import ast
+import inspect
+import io
+import logging
+import mmap
 import os
 import sys
 import tempfile
 import zipfile
 from pathlib import Path
+from unittest import mock
 import shutil
 import subprocess
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext, redirect_stdout
+
+import builder
+import launcher
+from test_build import write_tree
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# launcher.py is parsed once; tests check function sources from this tree
+_LAUNCHER_SOURCE = Path(launcher.__file__).read_text(encoding="utf-8")
+_LAUNCHER_FUNCTIONS = {
+    node.name: node for node in ast.parse(_LAUNCHER_SOURCE).body
+    if isinstance(node, ast.FunctionDef)
+}
+
+
+def _launcher_function_source(name):
+    """Return the source of a top-level launcher function."""
+    return ast.get_source_segment(_LAUNCHER_SOURCE, _LAUNCHER_FUNCTIONS[name])
+
+
+@contextmanager
+def _workdir(workdir):
+    """Yield workdir, or a fresh temporary directory when it is None."""
+    if workdir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+    else:
+        workdir.mkdir(parents=True, exist_ok=True)
+        yield workdir
 
 
 def test_payload_marker_in_files():
@@ -25,9 +65,6 @@ def test_payload_marker_in_files():
     print("TEST 1: Payload Marker Verification")
     print("=" * 70)
     
-    import launcher
-    import builder
-    
     # Check marker is defined
     assert hasattr(launcher, 'PAYLOAD_MARKER'), "launcher.py missing PAYLOAD_MARKER"
     assert hasattr(builder, 'PAYLOAD_MARKER'), "builder.py missing PAYLOAD_MARKER"
@@ -40,30 +77,27 @@ def test_payload_marker_in_files():
     return True
 
 
-def test_launcher_can_open_and_find_marker():
+def test_launcher_can_open_and_find_marker(workdir=None):
     """Test 2: Verify launcher can open __file__ and locate marker."""
     print("\n" + "=" * 70)
     print("TEST 2: Launcher Marker Detection")
     print("=" * 70)
     
-    import launcher
-    
-    # Create a test file with marker
-    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.py') as f:
-        test_file = Path(f.name)
-        
-        # Write Python code
-        f.write(b"#!/usr/bin/env python3\n")
-        f.write(b"# Test file\n")
-        f.write(b"print('hello')\n")
-        
-        # Write marker
-        f.write(launcher.PAYLOAD_MARKER)
+    with _workdir(workdir) as temp_path:
+        # Create a test file with marker
+        test_file = temp_path / "test.py"
+        with open(test_file, 'wb') as f:
+            # Write Python code
+            f.write(b"#!/usr/bin/env python3\n")
+            f.write(b"# Test file\n")
+            f.write(b"print('hello')\n")
+            
+            # Write marker
+            f.write(launcher.PAYLOAD_MARKER)
+            
+            # Write fake ZIP data
+            f.write(b"PK\x03\x04")  # ZIP magic number
         
-        # Write fake ZIP data
-        f.write(b"PK\x03\x04")  # ZIP magic number
-    
-    try:
         # Test opening in binary mode and finding marker
         with open(test_file, "rb") as f:
             content = f.read()
@@ -81,25 +115,15 @@ def test_launcher_can_open_and_find_marker():
         print(f"✓ Marker found at offset: {offset}")
         
         return True
-    finally:
-        test_file.unlink()
 
 
-def test_payload_extraction_with_zipfile():
+def test_payload_extraction_with_zipfile(workdir=None):
     """Test 3: Verify launcher extracts payload using zipfile.ZipFile."""
     print("\n" + "=" * 70)
     print("TEST 3: Payload Extraction")
     print("=" * 70)
     
-    import launcher
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
+    with _workdir(workdir) as temp_path:
         # Create a real ZIP file
         zip_path = temp_path / "test_payload.zip"
         with zipfile.ZipFile(zip_path, 'w') as zf:
@@ -124,32 +148,31 @@ def test_payload_extraction_with_zipfile():
         extract_dir = temp_path / "extracted"
         launcher.extract_payload(self_extract, offset, extract_dir, logger)
         
-        # Verify extraction
-        assert (extract_dir / "test.txt").exists(), "test.txt not extracted"
-        assert (extract_dir / "rcc.exe").exists(), "rcc.exe not extracted"
-        assert (extract_dir / "robot" / "robot.yaml").exists(), "robot.yaml not extracted"
+        # Verify extraction with one walk of the extracted tree
+        extracted = {
+            p.relative_to(extract_dir).as_posix(): p
+            for p in extract_dir.rglob('*') if p.is_file()
+        }
+        missing = {"test.txt", "rcc.exe", "robot/robot.yaml"} - extracted.keys()
+        assert not missing, f"Not extracted: {sorted(missing)}"
         
-        content = (extract_dir / "test.txt").read_text()
+        content = extracted["test.txt"].read_text()
         assert content == "Hello World", "File content corrupted"
         
         print("✓ Payload extracted using zipfile.ZipFile")
         print(f"✓ Extracted to: {extract_dir}")
-        print(f"✓ Files extracted: {len(list(extract_dir.rglob('*')))}")
+        print(f"✓ Files extracted: {len(extracted)}")
         
         return True
 
 
-def test_sentinel_file_creation():
+def test_sentinel_file_creation(workdir=None):
     """Test 4: Verify launcher creates sentinel file (.payload_hash)."""
     print("\n" + "=" * 70)
     print("TEST 4: Sentinel File (.payload_hash)")
     print("=" * 70)
     
-    import launcher
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
+    with _workdir(workdir) as temp_path:
         # Create a test file with payload
         test_file = temp_path / "test.py"
         test_file.write_bytes(b"test\n" + launcher.PAYLOAD_MARKER + b"payload_data_here")
@@ -174,21 +197,13 @@ def test_sentinel_file_creation():
         return True
 
 
-def test_builder_concatenation():
+def test_builder_concatenation(workdir=None):
     """Test 5: Verify builder concatenates launcher + marker + payload."""
     print("\n" + "=" * 70)
     print("TEST 5: Builder Concatenation")
     print("=" * 70)
     
-    import builder
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
+    with _workdir(workdir) as temp_path:
         # Create mock launcher
         launcher_file = temp_path / "launcher.py"
         launcher_file.write_text("#!/usr/bin/env python3\n# Mock launcher\n")
@@ -232,21 +247,13 @@ def test_builder_concatenation():
         return True
 
 
-def test_payload_structure():
+def test_payload_structure(workdir=None):
     """Test 6: Verify payload.zip contains rcc.exe, .rcc_home, robot/."""
     print("\n" + "=" * 70)
     print("TEST 6: Payload Structure")
     print("=" * 70)
     
-    import builder
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
+    with _workdir(workdir) as temp_path:
         # Create mock components
         rcc_file = temp_path / "rcc.exe"
         rcc_file.write_text("mock rcc executable")
@@ -295,21 +302,25 @@ def test_rcc_execution_command():
     print("TEST 7: RCC Execution Command")
     print("=" * 70)
     
-    import launcher
-    
     # Check the run_rcc function signature
-    import inspect
     sig = inspect.signature(launcher.run_rcc)
     params = list(sig.parameters.keys())
     
     assert 'rcc_exe' in params, "run_rcc missing rcc_exe parameter"
     assert 'robot_yaml' in params, "run_rcc missing robot_yaml parameter"
     
-    # Read the source to verify command construction
-    source = inspect.getsource(launcher.run_rcc)
+    # Check the command arguments and that run_rcc builds the command from them
+    assert launcher.RCC_RUN_ARGS == ("run", "--robot"), "Command isn't 'run --robot'"
+    assert 'RCC_RUN_ARGS' in launcher.run_rcc.__code__.co_names, "run_rcc doesn't use RCC_RUN_ARGS"
     
-    assert '"run"' in source or "'run'" in source, "Command doesn't include 'run'"
-    assert '"--robot"' in source or "'--robot'" in source, "Command doesn't include '--robot'"
+    # Check the process actually spawned, without running anything
+    robot_yaml = Path("robot") / "robot.yaml"
+    with mock.patch.object(launcher.subprocess, "run") as run:
+        run.return_value.returncode = 0
+        assert launcher.run_rcc(Path("rcc.exe"), robot_yaml, None, logger) == 0
+    args, kwargs = run.call_args
+    assert args[0] == ["rcc.exe", "run", "--robot", str(robot_yaml)], f"Unexpected command: {args[0]}"
+    assert kwargs["close_fds"] is False, "run_rcc should not close inherited descriptors"
     
     print("✓ Launcher executes: rcc.exe run --robot robot/robot.yaml")
     print("✓ Command construction verified in run_rcc()")
@@ -323,14 +334,12 @@ def test_robocorp_home_setting():
     print("TEST 8: ROBOCORP_HOME Setting")
     print("=" * 70)
     
-    import launcher
-    import inspect
-    
-    # Check run_rcc function sets ROBOCORP_HOME
-    source = inspect.getsource(launcher.run_rcc)
+    # Check run_rcc function sets ROBOCORP_HOME in a copy of the environment
+    names = launcher.run_rcc.__code__.co_names
     
-    assert 'ROBOCORP_HOME' in source, "ROBOCORP_HOME not set in run_rcc"
-    assert 'env[' in source or 'environ' in source, "Environment not modified"
+    assert launcher.ROBOCORP_HOME_ENV == "ROBOCORP_HOME", "Wrong environment variable name"
+    assert 'ROBOCORP_HOME_ENV' in names, "ROBOCORP_HOME not set in run_rcc"
+    assert 'environ' in names, "Environment not modified"
     
     print("✓ Launcher sets ROBOCORP_HOME in environment")
     print("✓ Environment variable passed to subprocess")
@@ -344,11 +353,8 @@ def test_windows_localappdata_path():
     print("TEST 9: Windows Path Configuration")
     print("=" * 70)
     
-    import launcher
-    
     # Check get_extraction_path function
-    import inspect
-    source = inspect.getsource(launcher.get_extraction_path)
+    source = _launcher_function_source("get_extraction_path")
     
     assert 'LOCALAPPDATA' in source, "get_extraction_path doesn't check LOCALAPPDATA"
     assert 'MyRccAssistant' in source or 'APP_NAME' in source, "App name not used"
@@ -363,35 +369,23 @@ def test_windows_localappdata_path():
     return True
 
 
-def test_end_to_end_build():
+def test_end_to_end_build(workdir=None):
     """Test 10: End-to-end build process validation."""
     print("\n" + "=" * 70)
     print("TEST 10: End-to-End Build Validation")
     print("=" * 70)
     
-    import builder
-    import launcher
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
+    with _workdir(workdir) as temp_path:
         # Create complete mock environment
+        write_tree(temp_path, {
+            "rcc.exe": b"#!/bin/bash\necho 'Mock RCC'",
+            ".rcc_home/holotree/catalog.db": b"catalog",
+            "robot/robot.yaml": b"tasks:\n  Run:\n    shell: echo 'Hello'",
+        })
         rcc_file = temp_path / "rcc.exe"
-        rcc_file.write_text("#!/bin/bash\necho 'Mock RCC'")
         rcc_file.chmod(0o755)
-        
         rcc_home = temp_path / ".rcc_home"
-        rcc_home.mkdir()
-        (rcc_home / "holotree").mkdir()
-        (rcc_home / "holotree" / "catalog.db").write_text("catalog")
-        
         robot_dir = temp_path / "robot"
-        robot_dir.mkdir()
-        (robot_dir / "robot.yaml").write_text("tasks:\n  Run:\n    shell: echo 'Hello'")
         
         # Build payload ZIP
         payload_zip = temp_path / "payload.zip"
@@ -405,31 +399,76 @@ def test_end_to_end_build():
         # Verify the complete file
         assert output_file.exists(), "Output file not created"
         
-        with open(output_file, 'rb') as f:
-            content = f.read()
-        
-        # Verify structure
-        assert content.startswith(b"#!/usr/bin/env python3"), "Missing shebang"
-        assert builder.PAYLOAD_MARKER in content, "Marker not in output"
-        
-        # Use launcher's find_payload_offset to find the LAST occurrence
+        # Use launcher's find_payload_offset to skip the marker in the launcher source
         offset = launcher.find_payload_offset(output_file)
         assert offset is not None, "Could not find payload offset"
         
-        # Verify ZIP magic number at the offset
-        assert content[offset:offset+4] == b"PK\x03\x04", "ZIP not properly appended"
+        # Check the mapped file rather than reading it into memory
+        with open(output_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            # Verify structure
+            shebang = b"#!/usr/bin/env python3"
+            assert content[:len(shebang)] == shebang, "Missing shebang"
+            assert content.rfind(builder.PAYLOAD_MARKER) != -1, "Marker not in output"
+            
+            # Verify ZIP magic number at the offset
+            assert content[offset:offset+4] == b"PK\x03\x04", "ZIP not properly appended"
+            size = len(content)
         
         print("✓ Complete build process verified")
         print(f"✓ Output file: {output_file}")
-        print(f"✓ File size: {len(content):,} bytes")
+        print(f"✓ File size: {size:,} bytes")
         print(f"✓ Launcher code: {offset:,} bytes")
-        print(f"✓ Payload size: {len(content) - offset:,} bytes")
+        print(f"✓ Payload size: {size - offset:,} bytes")
         
         return True
 
 
-def main():
-    """Run all comprehensive tests."""
+def _run_test(index, name, test_func, root):
+    """
+    Run one test with its stdout and log records captured together, so a
+    test's output stays in one block (may run in a worker process).
+    
+    Returns:
+        (name, passed, output) tuple
+    """
+    kwargs = {}
+    if "workdir" in inspect.signature(test_func).parameters:
+        kwargs["workdir"] = Path(root) / f"test_{index}"
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    root_logger = logging.getLogger()
+    saved_handlers = root_logger.handlers
+    root_logger.handlers = [handler]
+    with redirect_stdout(output):
+        try:
+            result = test_func(**kwargs)
+        except Exception as e:
+            print(f"\n✗ Test '{name}' failed: {e}")
+            traceback.print_exc(file=output)
+            result = False
+        finally:
+            root_logger.handlers = saved_handlers
+    return name, result, output.getvalue()
+
+
+def main(argv=None):
+    """
+    Run all comprehensive tests.
+    
+    The tests run one by one in this process; with --parallel they run in
+    a process pool instead. Either way each test's output is printed in
+    order once it finishes.
+    """
+    parser = argparse.ArgumentParser(description="Run the audit validation tests")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Run the tests in a process pool (only pays off for slow tests)"
+    )
+    args = parser.parse_args(argv)
+    
     print("=" * 70)
     print("COMPREHENSIVE AUDIT VALIDATION")
     print("Self-Extracting RCC Assistant")
@@ -448,16 +487,21 @@ def main():
         ("End-to-End Build", test_end_to_end_build),
     ]
     
-    results = []
-    for name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((name, result))
-        except Exception as e:
-            print(f"\n✗ Test '{name}' failed: {e}")
-            import traceback
-            traceback.print_exc()
-            results.append((name, False))
+    # One temporary root for the whole run; each test gets its own subdir
+    with tempfile.TemporaryDirectory() as root:
+        run_args = (
+            range(1, len(tests) + 1),
+            [name for name, _ in tests],
+            [test_func for _, test_func in tests],
+            [root] * len(tests),
+        )
+        workers = min(len(tests), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) if args.parallel else nullcontext() as pool:
+            outcomes = pool.map(_run_test, *run_args) if args.parallel else map(_run_test, *run_args)
+            results = []
+            for name, result, output in outcomes:
+                print(output, end="")
+                results.append((name, result))
     
     # Summary
     print("\n" + "=" * 70)
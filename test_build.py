@@ -6,34 +6,71 @@ This script performs basic validation of the launcher and builder
 functionality without requiring actual RCC or robot files.
 """
 
+import logging
 import sys
 import tempfile
 import zipfile
+import zlib
 from pathlib import Path
 import shutil
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Mock payload files, relative to the test's temporary directory
+MOCK_FILES = {
+    "rcc.exe": b"#!/usr/bin/env python3\nprint('Mock RCC')\n",
+    ".rcc_home/test.txt": b"Mock Holotree",
+    "robot/robot.yaml": b"tasks:\n  Run:\n    shell: echo 'Hello'\n",
+    "robot/README.md": b"# Mock Robot",
+}
+
+
+def write_tree(root, files):
+    """Write {relative path: bytes} below root, creating each parent once."""
+    for parent in {(root / rel).parent for rel in files}:
+        parent.mkdir(parents=True, exist_ok=True)
+    for rel, data in files.items():
+        with open(root / rel, "wb", buffering=0) as f:
+            f.write(data)
+
 
 def create_mock_payload(temp_dir):
     """Create a mock payload for testing."""
     print("Creating mock payload...")
     
-    # Create mock RCC executable
+    write_tree(temp_dir, MOCK_FILES)
     mock_rcc = temp_dir / "rcc.exe"
-    mock_rcc.write_text("#!/usr/bin/env python3\nprint('Mock RCC')\n")
     mock_rcc.chmod(0o755)
     
-    # Create mock .rcc_home
-    mock_rcc_home = temp_dir / ".rcc_home"
-    mock_rcc_home.mkdir()
-    (mock_rcc_home / "test.txt").write_text("Mock Holotree")
+    return mock_rcc, temp_dir / ".rcc_home", temp_dir / "robot"
+
+
+def _build_mock_assistant(temp_dir, files=None, rcc_mode=0o755, **kwargs):
+    """
+    Build temp_dir/test_assistant.py from MOCK_FILES and return its path.
     
-    # Create mock robot
-    mock_robot = temp_dir / "robot"
-    mock_robot.mkdir()
-    (mock_robot / "robot.yaml").write_text("tasks:\n  Run:\n    shell: echo 'Hello'\n")
-    (mock_robot / "README.md").write_text("# Mock Robot")
+    files adds to or overrides MOCK_FILES; kwargs are passed on to
+    builder.build_assistant.
+    """
+    import builder
     
-    return mock_rcc, mock_rcc_home, mock_robot
+    print("Creating mock payload...")
+    write_tree(temp_dir, {**MOCK_FILES, **(files or {})})
+    (temp_dir / "rcc.exe").chmod(rcc_mode)
+    
+    output_path = temp_dir / "test_assistant.py"
+    builder.build_assistant(
+        Path(__file__).parent / "launcher.py",
+        temp_dir / "rcc.exe",
+        temp_dir / ".rcc_home",
+        temp_dir / "robot",
+        output_path,
+        logger,
+        **kwargs
+    )
+    return output_path
 
 
 def test_payload_marker_detection():
@@ -71,6 +108,36 @@ def test_payload_marker_detection():
         temp_file.unlink()
 
 
+def test_marker_detection_large_file():
+    """Test that marker detection maps large files instead of reading them."""
+    print("\n" + "=" * 60)
+    print("TEST: Marker Detection In Large File")
+    print("=" * 60)
+    
+    import launcher
+    
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.py') as f:
+        temp_file = Path(f.name)
+        f.write(b"# Test file\n# ")
+        f.write(launcher.PAYLOAD_MARKER)
+        f.write(b"PK\x03\x04")
+        # Sparse 1 GB tail: reading it into memory would take 1 GB of RAM
+        f.truncate(1 << 30)
+    
+    try:
+        offset = launcher.find_payload_offset(temp_file)
+        expected = len(b"# Test file\n# ") + len(launcher.PAYLOAD_MARKER)
+        
+        if offset == expected:
+            print(f"✓ Marker found at offset {offset} in a 1 GB file")
+            return True
+        else:
+            print(f"✗ Marker offset {offset}, expected {expected}")
+            return False
+    finally:
+        temp_file.unlink()
+
+
 def test_builder_basic():
     """Test that builder can create a payload ZIP."""
     print("\n" + "=" * 60)
@@ -89,11 +156,6 @@ def test_builder_basic():
         # Create output ZIP
         output_zip = temp_path / "payload.zip"
         
-        # Create logger
-        import logging
-        logger = logging.getLogger(__name__)
-        logging.basicConfig(level=logging.INFO)
-        
         try:
             builder.create_payload_zip(
                 mock_rcc,
@@ -121,6 +183,12 @@ def test_builder_basic():
                     else:
                         print(f"  ✗ Missing: {exp}")
                         return False
+                
+                # Executables don't deflate well enough to be worth the CPU
+                if zf.getinfo('rcc.exe').compress_type != zipfile.ZIP_STORED:
+                    print("  ✗ rcc.exe is not stored")
+                    return False
+                print("  ✓ rcc.exe is stored uncompressed")
             
             return True
             
@@ -129,6 +197,76 @@ def test_builder_basic():
             return False
 
 
+def test_accelerated_zlib():
+    """Test that a serial build deflates with zlib-ng when asked to."""
+    print("\n" + "=" * 60)
+    print("TEST: Accelerated zlib")
+    print("=" * 60)
+    
+    import builder
+    
+    if builder._zlib is zlib or not builder.RAW_ENTRY_WRITES:
+        print("✓ Skipped (zlib-ng not installed or Python not supported)")
+        return True
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        mock_rcc, mock_rcc_home, mock_robot = create_mock_payload(temp_path)
+        # Large and repetitive enough for zlib-ng and zlib output to differ
+        text = b"".join(b"line %d: shell: echo 'Hello'\n" % (n % 97) for n in range(20000))
+        (mock_robot / "tasks.txt").write_bytes(text)
+        output_zip = temp_path / "payload.zip"
+        builder.create_payload_zip(
+            mock_rcc, mock_rcc_home, mock_robot, output_zip, logger,
+            jobs=1, accelerated_zlib=True
+        )
+        
+        compressor = builder._zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        expected = len(compressor.compress(text) + compressor.flush())
+        with zipfile.ZipFile(output_zip, 'r') as zf:
+            bad = zf.testzip()
+            content = zf.read('robot/tasks.txt')
+            compress_size = zf.getinfo('robot/tasks.txt').compress_size
+        
+        if bad is not None or content != text:
+            print(f"✗ Corrupt entry: {bad}")
+            return False
+        if compress_size != expected:
+            print(f"✗ Entry is {compress_size} bytes, {builder._zlib.__name__} gives {expected}")
+            return False
+        print(f"✓ Serial build deflated with {builder._zlib.__name__}")
+        return True
+
+
+def test_builder_reproducible():
+    """Test that identical inputs give byte-identical payloads."""
+    print("\n" + "=" * 60)
+    print("TEST: Reproducible Payload")
+    print("=" * 60)
+    
+    import builder
+    import os
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        mock_rcc, mock_rcc_home, mock_robot = create_mock_payload(temp_path)
+        
+        payloads = []
+        for i in range(2):
+            output_zip = temp_path / f"payload_{i}.zip"
+            builder.create_payload_zip(mock_rcc, mock_rcc_home, mock_robot, output_zip, logger)
+            payloads.append(output_zip.read_bytes())
+            # Source timestamps must not leak into the payload
+            os.utime(mock_robot / "robot.yaml", (0, 1_000_000_000))
+        
+        if payloads[0] == payloads[1]:
+            print(f"✓ Both builds are identical ({len(payloads[0])} bytes)")
+            return True
+        else:
+            print("✗ Payloads differ between builds")
+            return False
+
+
 def test_extraction_path():
     """Test that extraction path is determined correctly."""
     print("\n" + "=" * 60)
@@ -163,10 +301,6 @@ def test_end_to_end_build():
     print("=" * 60)
     
     import builder
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
     
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir)
@@ -216,6 +350,484 @@ def test_end_to_end_build():
             return False
 
 
+def test_rcc_executable_after_extraction():
+    """Test that the extracted RCC keeps its executable bit."""
+    print("\n" + "=" * 60)
+    print("TEST: RCC Executable After Extraction")
+    print("=" * 60)
+    
+    if sys.platform == "win32":
+        print("✓ Skipped on Windows (no POSIX modes)")
+        return True
+    
+    import launcher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        # Build from a copy of rcc that has lost its executable bit
+        output_path = _build_mock_assistant(temp_path, rcc_mode=0o644)
+        
+        target_dir = temp_path / "extracted"
+        offset = launcher.find_payload_offset(output_path)
+        launcher.extract_payload(output_path, offset, target_dir, logger)
+        
+        mode = (target_dir / "rcc.exe").stat().st_mode & 0o777
+        if mode & 0o111:
+            print(f"✓ Extracted RCC is executable ({oct(mode)})")
+            return True
+        else:
+            print(f"✗ Extracted RCC is not executable ({oct(mode)})")
+            return False
+
+
+def test_parallel_extraction():
+    """Test that threaded extraction gives the same tree as serial extraction."""
+    print("\n" + "=" * 60)
+    print("TEST: Parallel Extraction")
+    print("=" * 60)
+    
+    import filecmp
+    import launcher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        output_path = _build_mock_assistant(temp_path, {
+            f".rcc_home/holotree/pkg_{i % 5}/module_{i}.py": f"VALUE = {i}\n".encode() * (i + 1)
+            for i in range(40)
+        })
+        offset = launcher.find_payload_offset(output_path)
+        launcher.extract_payload(output_path, offset, temp_path / "serial", logger, workers=1)
+        launcher.extract_payload(output_path, offset, temp_path / "parallel", logger, workers=4)
+        
+        # Walk the whole tree; dircmp only compares the top level
+        pending = [filecmp.dircmp(temp_path / "serial", temp_path / "parallel")]
+        while pending:
+            cmp = pending.pop()
+            if cmp.left_only or cmp.right_only or cmp.diff_files or cmp.funny_files:
+                print(f"✗ Trees differ in {cmp.left}: {cmp.left_only} {cmp.right_only} {cmp.diff_files}")
+                return False
+            pending.extend(cmp.subdirs.values())
+        
+        print("✓ Parallel extraction matches serial extraction")
+        return True
+
+
+def test_run_as_script():
+    """Test that "python assistant.py" runs the launcher end to end."""
+    print("\n" + "=" * 60)
+    print("TEST: Run As Script")
+    print("=" * 60)
+    
+    if sys.platform == "win32":
+        print("✓ Skipped on Windows (mock rcc is a shell script)")
+        return True
+    
+    import os
+    import subprocess
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        output_path = _build_mock_assistant(
+            temp_path, {"rcc.exe": b"#!/bin/sh\necho \"mock rcc $1\"\n"}
+        )
+        
+        # Python runs the file as a zip application; the payload's
+        # __main__.py must hand over to the launcher in front of it
+        env = dict(os.environ, HOME=str(temp_path / "home"))
+        result = subprocess.run(
+            [sys.executable, str(output_path)],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        
+        if result.returncode == 0 and "mock rcc run" in result.stdout:
+            print("✓ Assistant extracted its payload and ran RCC")
+            return True
+        else:
+            print(f"✗ Exit code {result.returncode}: {result.stdout[-500:]}{result.stderr[-500:]}")
+            return False
+
+
+def test_zip64_limit():
+    """Test that payloads needing ZIP64 are detected at the format limits."""
+    print("\n" + "=" * 60)
+    print("TEST: ZIP64 Limit")
+    print("=" * 60)
+    
+    import os
+    import builder
+    
+    def entries(count, size=0):
+        infos = [zipfile.ZipInfo(f"f{i}") for i in range(count)]
+        for zinfo in infos:
+            zinfo.file_size = zinfo.compress_size = 0
+        infos[-1].file_size = size
+        return infos
+    
+    limit = zipfile.ZIP64_LIMIT
+    cases = [
+        ("65,535 entries", entries(zipfile.ZIP_FILECOUNT_LIMIT), 0, False),
+        ("65,536 entries", entries(zipfile.ZIP_FILECOUNT_LIMIT + 1), 0, True),
+        ("entry at 4 GiB - 1", entries(1, limit), 0, False),
+        ("entry over 4 GiB - 1", entries(1, limit + 1), 0, True),
+        # Offsets are absolute, so the launcher in front of the payload counts
+        ("central directory at 4 GiB - 1", entries(1), limit, False),
+        ("central directory over 4 GiB - 1", entries(1), limit + 1, True),
+    ]
+    
+    for name, infolist, central_dir_offset, expected in cases:
+        reason = builder.zip64_reason(infolist, central_dir_offset)
+        if (reason is not None) != expected:
+            print(f"✗ {name}: got {reason!r}")
+            return False
+    
+    # A small payload behind a launcher just under 4 GiB: zipfile writes a
+    # ZIP64 end record, so zip64_reason must flag it too. Seeking leaves a
+    # sparse hole rather than writing the launcher out.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(Path(temp_dir) / "offset.zip", "w+b") as f:
+            f.seek(limit - 10)
+            with zipfile.ZipFile(f, "w") as zf:
+                zf.writestr("robot/robot.yaml", MOCK_FILES["robot/robot.yaml"])
+                reason = builder.zip64_reason(zf.infolist(), f.tell())
+            f.seek(-256, os.SEEK_END)
+            zip64_written = b"PK\x06\x06" in f.read()
+    
+    if not zip64_written or reason is None:
+        print(f"✗ Offset payload: ZIP64 written {zip64_written}, got {reason!r}")
+        return False
+    
+    print(f"✓ {len(cases) + 1} cases on either side of the ZIP64 limits")
+    return True
+
+
+def test_zip64_build():
+    """Test that a payload needing ZIP64 fails the build unless allowed."""
+    print("\n" + "=" * 60)
+    print("TEST: ZIP64 Build")
+    print("=" * 60)
+    
+    # One entry over the limit once the RCC, robot and __main__.py are added
+    files = {f".rcc_home/h/{i // 256}/{i}": b"" for i in range(zipfile.ZIP_FILECOUNT_LIMIT)}
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        try:
+            _build_mock_assistant(temp_path, files)
+        except ValueError as e:
+            print(f"✓ Build refused: {e}")
+        else:
+            print("✗ ZIP64 payload built without allow_zip64")
+            return False
+        
+        if (temp_path / "test_assistant.py").exists():
+            print("✗ Refused build left its output behind")
+            return False
+        
+        output_path = _build_mock_assistant(temp_path, files, allow_zip64=True)
+        with zipfile.ZipFile(output_path) as zf:
+            count = len(zf.namelist())
+    
+    if count > zipfile.ZIP_FILECOUNT_LIMIT:
+        print(f"✓ Built with allow_zip64 ({count:,} entries)")
+        return True
+    else:
+        print(f"✗ Expected a ZIP64 payload, got {count:,} entries")
+        return False
+
+
+def test_robot_pruning():
+    """Test that hidden and cache directories are left out of the robot."""
+    print("\n" + "=" * 60)
+    print("TEST: Robot Directory Pruning")
+    print("=" * 60)
+    
+    import builder
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        robot = Path(temp_dir)
+        (robot / "robot.yaml").write_text("tasks: {}\n")
+        for skipped in [".git/objects", "__pycache__", "node_modules/pkg", ".venv/bin"]:
+            (robot / skipped).mkdir(parents=True)
+            (robot / skipped / "file").write_text("skip me")
+        (robot / ".env").write_text("SECRET=1")
+        (robot / "src").mkdir()
+        (robot / "src" / "task.py").write_text("print('task')\n")
+        
+        names = sorted(rel for _, rel, _ in builder.iter_files(robot, prune=True))
+        
+        if names == ["robot.yaml", "src/task.py"]:
+            print(f"✓ Only project files kept: {names}")
+            return True
+        else:
+            print(f"✗ Unexpected files: {names}")
+            return False
+
+
+def test_marker_inside_payload():
+    """Test that a marker inside the payload doesn't move the offset."""
+    print("\n" + "=" * 60)
+    print("TEST: Marker Inside Payload")
+    print("=" * 60)
+    
+    import launcher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        # .zip entries are stored, so the marker bytes end up verbatim
+        output_path = _build_mock_assistant(temp_path, {
+            "robot/bundle.zip": b"junk" + launcher.PAYLOAD_MARKER + b"junk"
+        })
+        
+        content = output_path.read_bytes()
+        offset = launcher.find_payload_offset(output_path)
+        expected = content.index(b"PK\x03\x04")
+        
+        if offset == expected:
+            print(f"✓ Payload offset {offset} is the start of the ZIP")
+            return True
+        else:
+            print(f"✗ Payload offset {offset}, expected {expected}")
+            return False
+
+
+def test_parallel_compression():
+    """Test that worker-compressed entries match the serial payload."""
+    print("\n" + "=" * 60)
+    print("TEST: Parallel Compression")
+    print("=" * 60)
+    
+    import builder
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        mock_rcc, mock_rcc_home, mock_robot = create_mock_payload(temp_path)
+        for i in range(20):
+            (mock_robot / f"task_{i}.py").write_text(f"print({i})\n" * (i + 1) * 100)
+        
+        payloads = {}
+        for jobs in (1, 2):
+            output_zip = temp_path / f"payload_{jobs}.zip"
+            builder.create_payload_zip(
+                mock_rcc, mock_rcc_home, mock_robot, output_zip, logger, jobs=jobs
+            )
+            with zipfile.ZipFile(output_zip, 'r') as zf:
+                bad = zf.testzip()
+                if bad is not None:
+                    print(f"✗ CRC mismatch in {bad} with jobs={jobs}")
+                    return False
+                payloads[jobs] = {name: zf.read(name) for name in zf.namelist()}
+        
+        if payloads[1] == payloads[2]:
+            print(f"✓ {len(payloads[2])} entries identical with 1 and 2 workers")
+            return True
+        else:
+            print("✗ Parallel payload differs from serial payload")
+            return False
+
+
+def test_raw_entry_writes():
+    """Test that pre-compressed entries match what ZipFile writes itself."""
+    print("\n" + "=" * 60)
+    print("TEST: Raw Entry Writes")
+    print("=" * 60)
+    
+    import builder
+    import os
+    
+    if not builder.RAW_ENTRY_WRITES:
+        print(f"✓ Skipped (Python {sys.version_info[0]}.{sys.version_info[1]} "
+              f"always uses ZipFile.open())")
+        return True
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        files = {f"robot/task_{i}.py": f"print({i})\n".encode() * (i + 1) * 100
+                 for i in range(5)}
+        write_tree(temp_path, files)
+        
+        archives = []
+        for raw in (False, True):
+            output_zip = temp_path / f"payload_{raw}.zip"
+            with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
+                for rel in files:
+                    path = str(temp_path / rel)
+                    zinfo = builder._zip_info(path, rel, os.stat(path), builder.ZIP_EPOCH)
+                    if raw:
+                        builder._write_deflated(
+                            zf, zinfo, *builder._deflate_one(path, zlib.Z_DEFAULT_COMPRESSION)
+                        )
+                    else:
+                        zf.writestr(zinfo, files[rel])
+            archives.append(output_zip.read_bytes())
+        
+        with zipfile.ZipFile(temp_path / "payload_True.zip") as zf:
+            bad = zf.testzip()
+            contents = {name: zf.read(name) for name in zf.namelist()}
+        if bad is not None or contents != files:
+            print(f"✗ Pre-compressed archive reads back wrong (bad entry: {bad})")
+            return False
+        
+        # zlib-ng produces a different but equally valid DEFLATE stream
+        if builder._zlib is zlib and archives[0] != archives[1]:
+            print("✗ Pre-compressed archive differs from ZipFile.writestr() archive")
+            return False
+    
+    print(f"✓ {len(files)} pre-compressed entries match ZipFile's own output")
+    return True
+
+
+def test_compression_levels():
+    """Test that each deflated entry is compressed at its configured level."""
+    print("\n" + "=" * 60)
+    print("TEST: Compression Levels")
+    print("=" * 60)
+    
+    data = b"".join(f"line {i} of the task log\n".encode() for i in range(5000))
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = _build_mock_assistant(
+            Path(temp_dir),
+            {"robot/task.py": data, "robot/task.log": data},
+            compresslevel=1,
+            text_compresslevel=9
+        )
+        
+        with zipfile.ZipFile(output_path) as zf:
+            sizes = {name: zf.getinfo(f"robot/{name}").compress_size
+                     for name in ("task.py", "task.log")}
+    
+    # .py is an _EXT_TEXT extension, .log is not
+    for name, level in (("task.py", 9), ("task.log", 1)):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        expected = len(compressor.compress(data) + compressor.flush())
+        if sizes[name] != expected:
+            print(f"✗ {name}: {sizes[name]} bytes, expected {expected} at level {level}")
+            return False
+    
+    print(f"✓ Text entry at level 9 ({sizes['task.py']} bytes), "
+          f"other at level 1 ({sizes['task.log']} bytes)")
+    return True
+
+
+def test_large_file_streaming():
+    """Test that a large entry at an explicit level is streamed, not read whole."""
+    print("\n" + "=" * 60)
+    print("TEST: Large File Streaming")
+    print("=" * 60)
+    
+    import builder
+    import tracemalloc
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        mock_rcc, mock_rcc_home, mock_robot = create_mock_payload(temp_path)
+        size = builder.PARALLEL_MAX_FILE_SIZE + (1 << 20)
+        with open(mock_robot / "big.log", "wb") as f:
+            f.truncate(size)
+        
+        tracemalloc.start()
+        try:
+            builder.create_payload_zip(
+                mock_rcc, mock_rcc_home, mock_robot, temp_path / "payload.zip", logger,
+                compresslevel=1
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        with zipfile.ZipFile(temp_path / "payload.zip") as zf:
+            stored_size = zf.getinfo("robot/big.log").file_size
+    
+    # A few copy buffers, far below the size of the file
+    limit = 8 * builder.COPY_BUFFER_SIZE
+    if stored_size == size and peak < limit:
+        print(f"✓ {size / 1024 / 1024:.0f} MB entry written with {peak / 1024 / 1024:.1f} MB peak")
+        return True
+    else:
+        print(f"✗ Peak allocation {peak:,} bytes (limit {limit:,}), entry size {stored_size:,}")
+        return False
+
+
+def test_sentinel_fastpath():
+    """Test that the payload stamp skips hashing until the script changes."""
+    print("\n" + "=" * 60)
+    print("TEST: Sentinel Fast Path")
+    print("=" * 60)
+    
+    import launcher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        output_path = _build_mock_assistant(temp_path)
+        extract_dir = temp_path / "extracted"
+        extract_dir.mkdir()
+        
+        offset = launcher.find_payload_offset(output_path)
+        launcher.save_payload_hash(extract_dir, output_path, offset)
+        stamp_file = extract_dir / ".payload_stamp"
+        if stamp_file.read_text() != launcher.payload_stamp(output_path, offset):
+            print("✗ Stamp of the unchanged script doesn't match")
+            return False
+        
+        # Edit only the launcher code in front of the marker
+        content = output_path.read_bytes()
+        output_path.write_bytes(b"# edited\n" + content)
+        offset = launcher.find_payload_offset(output_path)
+        if stamp_file.read_text() == launcher.payload_stamp(output_path, offset):
+            print("✗ Stamp still matches after the script changed")
+            return False
+        
+        # The payload itself is unchanged, so the hash check keeps the files
+        if launcher.should_extract(extract_dir, output_path, offset, logger):
+            print("✗ Unchanged payload was extracted again")
+            return False
+        if stamp_file.read_text() == launcher.payload_stamp(output_path, offset):
+            print("✓ Stamp invalidated by the edit and refreshed after hashing")
+            return True
+        else:
+            print("✗ Stamp was not refreshed")
+            return False
+
+
+def test_manifest_cache():
+    """Test that located payload paths are cached and revalidated."""
+    print("\n" + "=" * 60)
+    print("TEST: Manifest Cache")
+    print("=" * 60)
+    
+    import launcher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        (temp_path / "robot").mkdir()
+        (temp_path / "robot" / "robot.yaml").write_text("tasks: {}\n")
+        (temp_path / "rcc").write_text("#!/bin/sh\n")
+        (temp_path / ".rcc_home").mkdir()
+        
+        found = launcher.locate_payload_paths(temp_path)
+        if not (temp_path / launcher.MANIFEST_FILE).exists():
+            print("✗ Manifest not written")
+            return False
+        if launcher.locate_payload_paths(temp_path) != found:
+            print("✗ Cached paths differ from searched paths")
+            return False
+        
+        # A stale manifest entry falls back to searching again
+        (temp_path / "rcc").rename(temp_path / "rcc.exe")
+        rcc_exe, _, _ = launcher.locate_payload_paths(temp_path)
+        if rcc_exe == temp_path / "rcc.exe":
+            print("✓ Manifest reused and refreshed when stale")
+            return True
+        else:
+            print(f"✗ Stale manifest returned {rcc_exe}")
+            return False
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -224,9 +836,25 @@ def main():
     
     tests = [
         ("Payload Marker Detection", test_payload_marker_detection),
+        ("Marker Detection In Large File", test_marker_detection_large_file),
         ("Builder ZIP Creation", test_builder_basic),
+        ("Accelerated zlib", test_accelerated_zlib),
+        ("Reproducible Payload", test_builder_reproducible),
         ("Extraction Path Detection", test_extraction_path),
         ("End-to-End Build", test_end_to_end_build),
+        ("RCC Executable After Extraction", test_rcc_executable_after_extraction),
+        ("Parallel Extraction", test_parallel_extraction),
+        ("Run As Script", test_run_as_script),
+        ("ZIP64 Limit", test_zip64_limit),
+        ("ZIP64 Build", test_zip64_build),
+        ("Robot Directory Pruning", test_robot_pruning),
+        ("Marker Inside Payload", test_marker_inside_payload),
+        ("Parallel Compression", test_parallel_compression),
+        ("Raw Entry Writes", test_raw_entry_writes),
+        ("Compression Levels", test_compression_levels),
+        ("Large File Streaming", test_large_file_streaming),
+        ("Sentinel Fast Path", test_sentinel_fastpath),
+        ("Manifest Cache", test_manifest_cache),
     ]
     
     results = []
@@ -9,23 +9,200 @@ This test demonstrates that:
 4. PyInstaller would fail on these files (which is why we build from launcher.py)
 """
 
+import io
+import mmap
+import os
 import sys
 import tempfile
+import traceback
 import zipfile
 from pathlib import Path
 import shutil
 import subprocess
+from contextlib import redirect_stdout
 
-# Add the repo to path
-sys.path.insert(0, '/home/runner/work/rcc-selfextracting-assistant/rcc-selfextracting-assistant')
+# Import builder and launcher from this checkout wherever it is run from
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 import builder
 import launcher as launcher_module
 import logging
 
-def test_self_extracting_file_properties():
+# Everything the test writes is thrown away, so keep it in RAM-backed tmpfs
+# when the system has one
+TEMP_ROOT = '/dev/shm' if os.access('/dev/shm', os.W_OK | os.X_OK) else None
+
+# The marker comes from the launcher itself; the builder always starts the
+# payload with a local file header
+MARKER = launcher_module.PAYLOAD_MARKER
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+# Entries build_artifact's mock components must produce
+EXPECTED_ENTRIES = ("rcc.exe", ".rcc_home/test.txt", "robot/robot.yaml")
+
+
+def build_artifact(temp_dir, logger):
+    """
+    Build a self-extracting file from mock components and return its path.
+    """
+    # Create mock components
+    print("1. Creating mock payload components...")
+    mock_rcc = temp_dir / "rcc.exe"
+    mock_rcc.write_text("#!/usr/bin/env python3\nimport sys\nprint('Mock RCC')\n")
+    
+    mock_rcc_home = temp_dir / ".rcc_home"
+    mock_rcc_home.mkdir()
+    (mock_rcc_home / "test.txt").write_text("Mock Holotree")
+    
+    mock_robot = temp_dir / "robot"
+    mock_robot.mkdir()
+    (mock_robot / "robot.yaml").write_text("tasks:\n  Run:\n    shell: echo 'Hello'\n")
+    print("   ✓ Mock components created")
+    
+    # Create the self-extracting file; build_assistant writes the payload
+    # ZIP straight after the marker, so no intermediate payload.zip is
+    # written and read back
+    print("\n2. Creating self-extracting file...")
+    launcher_path = Path(__file__).resolve().parent / "launcher.py"
+    output_path = temp_dir / "test_assistant.py"
+    builder.build_assistant(launcher_path, mock_rcc, mock_rcc_home, mock_robot,
+                            output_path, logger)
+    print(f"   ✓ Self-extracting file created: {output_path.stat().st_size:,} bytes")
+    
+    return output_path
+
+
+def inspect_artifact(output_path):
+    """
+    Locate the payload with the launcher and take the bytes the checks use.
+    
+    The file is mapped once; the checks only look at the launcher head, the
+    start of the payload, where a plain marker scan finds it and the ZIP's
+    entry names.
+    """
+    offset = launcher_module.find_payload_offset(output_path)
+    artifact = {"offset": offset, "head": b"", "window": b"", "marker_pos": -1,
+                "names": []}
+    if offset is None:
+        return artifact
+    
+    # The marker also appears in the launcher source, so it is searched
+    # for together with the local file header signature that follows it
+    with open(output_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        artifact["head"] = mm[:4096]
+        artifact["window"] = mm[offset:offset + (64 << 10)]
+        artifact["marker_pos"] = mm.find(MARKER + ZIP_SIGNATURE)
+        # ZipFile reads the end record and central directory straight from
+        # the mapping; the launcher bytes in front are allowed for
+        with zipfile.ZipFile(mm) as zf:
+            artifact["names"] = zf.namelist()
+    return artifact
+
+
+def check_launcher_finds_payload(artifact):
+    """Verify the launcher can correctly find and read the payload."""
+    print("\n3. Testing launcher's binary reading (should SUCCEED)...")
+    offset = artifact["offset"]
+    if offset is None:
+        print("   ✗ ERROR: Launcher couldn't find payload marker")
+        return False
+    
+    print(f"   ✓ Payload marker found at offset: {offset}")
+    return True
+
+
+def check_utf8_decode_fails(artifact):
+    """Verify the file contains binary data that would cause UTF-8 errors."""
+    print("\n4. Testing UTF-8 decoding (should FAIL - this is expected)...")
+    # The launcher code is valid UTF-8 and the payload's compressed data
+    # is not, so decoding the start of the payload fails just like the
+    # whole file would, at a cost independent of its size
+    try:
+        artifact["window"].decode('utf-8')
+        print("   ✗ ERROR: File is valid UTF-8 (unexpected!)")
+        print("   This means the binary payload is missing or corrupt.")
+        return False
+    except UnicodeDecodeError as e:
+        print(f"   ✓ UTF-8 decode failed as expected")
+        print(f"   Error: {str(e)[:80]}...")
+        print("   This is WHY PyInstaller fails on self-extracting files.")
+    return True
+
+
+def check_payload_is_zip(artifact):
+    """Verify the payload is a valid ZIP file."""
+    print("\n5. Verifying payload is valid ZIP...")
+    offset = artifact["offset"]
+    marker_pos = artifact["marker_pos"]
+    first_bytes = artifact["window"][:4]
+    
+    if marker_pos + len(MARKER) != offset:
+        print(f"   ✗ ERROR: Marker scan found the payload at {marker_pos + len(MARKER)}")
+        print(f"   Launcher reported: {offset}")
+        return False
+    
+    if first_bytes == ZIP_SIGNATURE:
+        print(f"   ✓ ZIP signature found: {first_bytes.hex()}")
+    else:
+        print(f"   ✗ ERROR: No ZIP signature at offset")
+        print(f"   Expected: {ZIP_SIGNATURE.hex()} (PK)")
+        print(f"   Got: {first_bytes.hex()}")
+        return False
+    
+    missing = set(EXPECTED_ENTRIES).difference(artifact["names"])
+    if missing:
+        print(f"   ✗ ERROR: Payload is missing entries: {sorted(missing)}")
+        return False
+    
+    print(f"   ✓ Payload lists {len(artifact['names'])} entries")
+    return True
+
+
+def check_decode_source_fails(artifact):
+    """Simulate what PyInstaller does with the file."""
+    print("\n6. Simulating PyInstaller behavior...")
+    print("   PyInstaller would call: importlib.util.decode_source(file_content)")
+    print("   This requires the entire file to be valid UTF-8.")
+    
+    try:
+        import importlib.util
+        decoded = importlib.util.decode_source(artifact["head"] + artifact["window"])
+        print("   ✗ ERROR: decode_source() succeeded (unexpected!)")
+        return False
+    except (UnicodeDecodeError, SyntaxError) as e:
+        print(f"   ✓ decode_source() failed as expected")
+        print(f"   Error type: {type(e).__name__}")
+        print(f"   This is the exact error that breaks PyInstaller.")
+    return True
+
+
+def print_summary():
+    """Explain what the checks show."""
+    print("\n" + "="* 70)
+    print("SUMMARY")
+    print("="* 70)
+    print("\n✓ Self-extracting files work correctly:")
+    print("  - File is created with embedded binary ZIP payload")
+    print("  - Launcher can read payload using binary mode (rb)")
+    print("  - Launcher finds the marker that is followed by the ZIP data")
+    print("  - Launcher treats payload as raw bytes, not UTF-8\n")
+    
+    print("✗ PyInstaller cannot process these files:")
+    print("  - File contains non-UTF-8 binary data")
+    print("  - importlib.util.decode_source() fails")
+    print("  - This is expected and cannot be fixed in launcher code\n")
+    
+    print("✓ Solution implemented:")
+    print("  - GitHub Actions workflow now builds .exe from launcher.py")
+    print("  - launcher.py is pure Python (no binary payload)")
+    print("  - PyInstaller can successfully process launcher.py")
+    print("  - Self-extracting .py files remain the recommended format\n")
+
+
+def main():
     """
-    Test that demonstrates the UTF-8 issue and the fix.
+    Build one self-extracting file and run every check against it.
     """
     print("="* 70)
     print("Testing Self-Extracting File Properties")
@@ -34,123 +211,52 @@ def test_self_extracting_file_properties():
     logger = logging.getLogger(__name__)
     logging.basicConfig(level=logging.WARNING)
     
-    temp_dir = Path(tempfile.mkdtemp())
+    temp_dir = Path(tempfile.mkdtemp(dir=TEMP_ROOT))
     print(f"\nWorking directory: {temp_dir}\n")
     
     try:
-        # Create mock components
-        print("1. Creating mock payload components...")
-        mock_rcc = temp_dir / "rcc.exe"
-        mock_rcc.write_text("#!/usr/bin/env python3\nimport sys\nprint('Mock RCC')\n")
-        
-        mock_rcc_home = temp_dir / ".rcc_home"
-        mock_rcc_home.mkdir()
-        (mock_rcc_home / "test.txt").write_text("Mock Holotree")
-        
-        mock_robot = temp_dir / "robot"
-        mock_robot.mkdir()
-        (mock_robot / "robot.yaml").write_text("tasks:\n  Run:\n    shell: echo 'Hello'\n")
-        print("   ✓ Mock components created")
-        
-        # Create payload ZIP
-        print("\n2. Creating payload ZIP...")
-        payload_zip = temp_dir / "payload.zip"
-        builder.create_payload_zip(mock_rcc, mock_rcc_home, mock_robot, payload_zip, logger)
-        print(f"   ✓ Payload ZIP created: {payload_zip.stat().st_size} bytes")
-        
-        # Create self-extracting file
-        print("\n3. Creating self-extracting file...")
-        launcher_path = Path('/home/runner/work/rcc-selfextracting-assistant/rcc-selfextracting-assistant/launcher.py')
-        output_path = temp_dir / "test_assistant.py"
-        builder.create_self_extracting_file(launcher_path, payload_zip, output_path, logger)
-        print(f"   ✓ Self-extracting file created: {output_path.stat().st_size:,} bytes")
-        
-        # Test 1: Verify file contains binary data that would cause UTF-8 errors
-        print("\n4. Testing UTF-8 decoding (should FAIL - this is expected)...")
-        with open(output_path, 'rb') as f:
-            content = f.read()
-        
-        try:
-            content.decode('utf-8')
-            print("   ✗ ERROR: File is valid UTF-8 (unexpected!)")
-            print("   This means the binary payload is missing or corrupt.")
-            return False
-        except UnicodeDecodeError as e:
-            print(f"   ✓ UTF-8 decode failed as expected")
-            print(f"   Error: {str(e)[:80]}...")
-            print("   This is WHY PyInstaller fails on self-extracting files.")
-        
-        # Test 2: Verify the launcher can correctly find and read the payload
-        print("\n5. Testing launcher's binary reading (should SUCCEED)...")
-        offset = launcher_module.find_payload_offset(output_path)
-        if offset is None:
-            print("   ✗ ERROR: Launcher couldn't find payload marker")
-            return False
-        
-        print(f"   ✓ Payload marker found at offset: {offset}")
-        
-        # Test 3: Verify the payload is a valid ZIP file
-        print("\n6. Verifying payload is valid ZIP...")
-        with open(output_path, 'rb') as f:
-            f.seek(offset)
-            first_bytes = f.read(4)
-            
-        if first_bytes[:2] == b'PK':
-            print(f"   ✓ ZIP signature found: {first_bytes.hex()}")
-        else:
-            print(f"   ✗ ERROR: No ZIP signature at offset")
-            print(f"   Expected: 504b (PK)")
-            print(f"   Got: {first_bytes.hex()}")
-            return False
-        
-        # Test 4: Try to simulate what PyInstaller does
-        print("\n7. Simulating PyInstaller behavior...")
-        print("   PyInstaller would call: importlib.util.decode_source(file_content)")
-        print("   This requires the entire file to be valid UTF-8.")
-        
-        try:
-            import importlib.util
-            decoded = importlib.util.decode_source(content)
-            print("   ✗ ERROR: decode_source() succeeded (unexpected!)")
-            return False
-        except (UnicodeDecodeError, SyntaxError) as e:
-            print(f"   ✓ decode_source() failed as expected")
-            print(f"   Error type: {type(e).__name__}")
-            print(f"   This is the exact error that breaks PyInstaller.")
-        
-        print("\n" + "="* 70)
-        print("SUMMARY")
-        print("="* 70)
-        print("\n✓ Self-extracting files work correctly:")
-        print("  - File is created with embedded binary ZIP payload")
-        print("  - Launcher can read payload using binary mode (rb)")
-        print("  - Launcher finds marker using rfind() to get last occurrence")
-        print("  - Launcher treats payload as raw bytes, not UTF-8\n")
-        
-        print("✗ PyInstaller cannot process these files:")
-        print("  - File contains non-UTF-8 binary data")
-        print("  - importlib.util.decode_source() fails")
-        print("  - This is expected and cannot be fixed in launcher code\n")
-        
-        print("✓ Solution implemented:")
-        print("  - GitHub Actions workflow now builds .exe from launcher.py")
-        print("  - launcher.py is pure Python (no binary payload)")
-        print("  - PyInstaller can successfully process launcher.py")
-        print("  - Self-extracting .py files remain the recommended format\n")
-        
-        return True
-        
+        artifact = inspect_artifact(build_artifact(temp_dir, logger))
     except Exception as e:
         print(f"\n✗ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        print(traceback.format_exc(), end="")
         return False
     finally:
         shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    checks = [
+        check_launcher_finds_payload,
+        check_utf8_decode_fails,
+        check_payload_is_zip,
+        check_decode_source_fails,
+    ]
+    
+    success = True
+    for check in checks:
+        try:
+            success = check(artifact) and success
+        except Exception as e:
+            print(f"\n✗ ERROR: {e}")
+            print(traceback.format_exc(), end="")
+            success = False
+    
+    if success:
+        print_summary()
+    return success
+
+
+def test_self_extracting_file_properties():
+    """Entry point for pytest: build the file and run every check."""
+    assert main()
 
 
 if __name__ == "__main__":
-    success = test_self_extracting_file_properties()
+    # Collect the report and write it to stdout in one go
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            success = main()
+    finally:
+        sys.stdout.write(output.getvalue())
     
     print("="* 70)
     if success: